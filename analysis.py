@@ -0,0 +1,167 @@
+import os
+from metrics import observe, stage
+from pdf_cache import PdfTextCache
+from pdf_extract import extract_text, extractor_version, match_skills_streaming
+import similarity
+import taxonomy
+
+TEXT_CACHE_FOLDER = os.path.join('cache', 'text')
+TEXT_CACHE_MAX_ENTRIES = 256
+# Characters of text held in memory across all entries; a single document can reach pdf_extract.MAX_CHARS
+TEXT_CACHE_MEMORY_CHARS = 64 * 1024 ** 2
+TEXT_CACHE_MAX_BYTES = 512 * 1024 ** 2
+
+def extract_text_from_pdf(path, **limits):
+    # Page, character and time budgets apply; see pdf_extract.extract_text for the per-document stats
+    with stage('pdf_extract'):
+        text, stats = extract_text(path, **limits)
+    observe('pdf_pages', stats['pages_read'])
+    observe('pdf_text_chars', len(text))
+    return text, stats
+
+pdf_text_cache = PdfTextCache(extract_text_from_pdf, TEXT_CACHE_FOLDER, max_entries=TEXT_CACHE_MAX_ENTRIES,
+                              version=extractor_version, max_disk_bytes=TEXT_CACHE_MAX_BYTES,
+                              max_memory_bytes=TEXT_CACHE_MEMORY_CHARS)
+
+STOP_REASONS = {
+    'max_pages': 'page limit',
+    'max_chars': 'text length limit',
+    'max_seconds': 'time limit',
+}
+
+def text_warning(document, stats):
+    # What the result page says about a document whose text was not read in full, else None
+    if stats.get('image_only') or not stats.get('chars'):
+        return f"No text could be read from the {document} (it may be a scanned image), so no skills were found in it."
+    reason = STOP_REASONS.get(stats.get('stopped'))
+    if reason:
+        return (f"Only {stats['pages_read']} of {stats['pages_total']} pages of the {document} were read "
+                f"({reason} reached); skills further on are not counted.")
+    return None
+
+def current_taxonomy():
+    # Skills, aliases and market weights come from taxonomy.json (see taxonomy.py) and can be
+    # swapped while the app runs, so look the taxonomy up per call instead of holding on to it
+    return taxonomy.current()
+
+def extract_skills(text, tax=None):
+    return (tax or current_taxonomy()).extract(text)
+
+def taxonomy_version():
+    # Identifies the taxonomy and weights an analysis was computed with, so cached results can be keyed on it
+    return current_taxonomy().version
+
+def compute_job_weights(required_skills, tax=None):
+    # Only use market importance for skills present in jobdesc, others divide leftover weight
+    importance_weights = (tax or current_taxonomy()).weights
+    weights = []
+    assigned = []
+    for skill in required_skills:
+        market_weight = importance_weights.get(skill.lower())
+        if market_weight is not None:
+            weights.append(market_weight)
+            assigned.append(True)
+        else:
+            weights.append(None)
+            assigned.append(False)
+    total_assigned = sum(w for w in weights if w is not None)
+    missing_count = assigned.count(False)
+    # Distribute any leftover weight if some skills have no market mapping
+    default_weight = ((100 - total_assigned)/missing_count) if missing_count > 0 else 0
+    for i in range(len(weights)):
+        if weights[i] is None:
+            weights[i] = round(default_weight,1)
+    # Normalize in case of rounding errors
+    total = sum(weights)
+    weights = [round(w*100/total,1) for w in weights]
+    return dict(zip(required_skills, weights))
+
+def skill_set(text, tax=None):
+    return (tax or current_taxonomy()).present(text)
+
+def skill_set_from_pdf(path, **limits):
+    # Matches page by page straight from the PDF, stopping once every skill has been seen
+    found, stats = match_skills_streaming(path, current_taxonomy(), **limits)
+    return found, stats
+
+def score_candidate(resume_all, required_skills, weights):
+    # Same arithmetic as the single-resume /analyze page, for reuse by batch paths
+    jobdesc_all = set(required_skills)
+    matching_skills = sorted(resume_all & jobdesc_all)
+    lacking_skills = sorted(jobdesc_all - resume_all)
+    matched_percent = sum(weights[skill] for skill in matching_skills)
+    return {
+        'matching_skills': matching_skills,
+        'lacking_skills': lacking_skills,
+        'matched_count': len(matching_skills),
+        'lacking_count': len(lacking_skills),
+        'total_skills': len(required_skills),
+        'suitability': round(matched_percent, 1),
+    }
+
+def _no_check():
+    pass
+
+def analysis_key(resume_digest, jobdesc_digest, version=None, similarity_version=None):
+    # A result depends on the taxonomy and on the similarity model's IDF table as well as the two documents
+    return (resume_digest, jobdesc_digest, version or taxonomy_version(),
+            similarity_version or similarity.current().version)
+
+def run_analysis(resume_path, jobdesc_path, check=_no_check, resume_digest=None, jobdesc_digest=None):
+    # The full resume-vs-JD pipeline behind /analyze. check() is called between
+    # stages so a background job can be cancelled or timed out part way through.
+    with stage('resume_text'):
+        resume_text, resume_stats = pdf_text_cache.text_for(resume_path, digest=resume_digest, check=check)
+    check()
+    with stage('jobdesc_text'):
+        jobdesc_text, jobdesc_stats = pdf_text_cache.text_for(jobdesc_path, digest=jobdesc_digest, check=check)
+    check()
+    # One taxonomy for the whole analysis, even if a reload lands part way through
+    tax = current_taxonomy()
+    with stage('skill_match'):
+        resume_all = skill_set(resume_text, tax)
+        jobdesc_all = skill_set(jobdesc_text, tax)
+    observe('skills_found', len(resume_all), document='resume')
+    observe('skills_found', len(jobdesc_all), document='jobdesc')
+    matching_skills = sorted(resume_all & jobdesc_all)
+    required_skills = sorted(jobdesc_all)
+    lacking_skills = sorted(jobdesc_all - resume_all)
+    check()
+    with stage('weighting'):
+        weights = compute_job_weights(required_skills, tax)
+    with stage('similarity'):
+        # Whole-text relevance, which also credits related wording that no skill keyword catches
+        model = similarity.current()
+        text_similarity = model.similarity(resume_text, jobdesc_text)
+
+    status_map = {}
+    for skill in required_skills:
+        if skill in matching_skills:
+            status_map[skill] = 'Matched'
+        else:
+            status_map[skill] = 'Lacking'
+
+    matched_percent = sum(weights[skill] for skill in matching_skills)
+    lacking_percent = sum(weights[skill] for skill in lacking_skills)
+    detailed_skills = [{'name': skill.title(), 'percent': round(weights[skill], 1)} for skill in required_skills]
+    text_warnings = [warning for warning in (text_warning('resume', resume_stats),
+                                             text_warning('job description', jobdesc_stats)) if warning]
+    return {
+        'resume_all_skills': sorted(resume_all),
+        'matching_skills': matching_skills,
+        'missing_skills': lacking_skills,
+        'required_skills': required_skills,
+        'matched_count': len(matching_skills),
+        'lacking_count': len(lacking_skills),
+        'total_skills': len(required_skills),
+        'pie_data': [round(matched_percent, 1), round(lacking_percent, 1)],
+        'detailed_skills': detailed_skills,
+        'weights': weights,
+        'status_map': status_map,
+        'similarity': round(text_similarity * 100, 1),
+        'taxonomy_version': tax.version,
+        'similarity_version': model.version,
+        'text_warnings': text_warnings,
+        # A time budget cut depends on load, so such a result should not be reused for later requests
+        'text_timed_out': 'max_seconds' in (resume_stats['stopped'], jobdesc_stats['stopped']),
+    }
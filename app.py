@@ -1,116 +1,116 @@
-from flask import Flask, request, render_template_string, redirect, url_for, send_from_directory, session, make_response
-from werkzeug.utils import secure_filename
-import PyPDF2
-import uuid
+from flask import Flask, Request, request, redirect, url_for, abort, session, make_response, Response, stream_with_context, jsonify, g
 import os
-import matplotlib.pyplot as plt
-from reportlab.lib.pagesizes import letter
-from reportlab.lib import colors
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
+import werkzeug.utils
+from werkzeug.exceptions import RequestEntityTooLarge
 from datetime import datetime
 import io
+import json
+import hashlib
+import hmac
+import sys
+import threading
+import time
+import cProfile
+import pstats
+from analysis import run_analysis, analysis_key, compute_job_weights, current_taxonomy, pdf_text_cache
+from caching import LRUCache
+from candidate_index import CandidateIndex, index_results, parse_query
+from metrics import registry, observe, stage, flatten_snapshot
+from jobs import JobQueue, QueueFull, DONE, FAILED, CANCELLED, TIMEOUT, FINISHED_STATES
+from screening import ArchiveRejected, prepare_job, screen_upload, to_ndjson, to_csv
+import similarity
+import taxonomy
+from session_store import SqliteSessionStore, SqliteSessionInterface
+from upload_store import UploadStore, UploadRejected
+
+# Multipart framing and the text fields around the files in the upload form
+UPLOAD_FORM_OVERHEAD = 64 * 1024
+
+class UploadRequest(Request):
+    # Views that take PDF uploads set upload_target before the form is parsed;
+    # their file parts are then streamed straight into the upload store, hashed
+    # and checked on the way, instead of being spooled by Werkzeug and copied.
+    # File parts whose names end in one of upload_passthrough are spooled by Werkzeug as usual.
+    upload_target = None
+    upload_max_bytes = None
+    upload_passthrough = ()
+    upload_spools = None
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if self.upload_target is not None and not (filename or '').lower().endswith(self.upload_passthrough):
+            spool = self.upload_target.incoming(self.upload_max_bytes)
+            self.upload_spools = (self.upload_spools or []) + [spool]
+            return spool
+        return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+
+    def close(self):
+        super().close()
+        # Spools of parts parsed before a later one was refused never reach request.files
+        for spool in self.upload_spools or ():
+            spool.close()
 
 app = Flask(__name__)
+app.request_class = UploadRequest
 app.secret_key = 'your_secret_key'
 UPLOAD_FOLDER = 'uploads'
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
-
-def extract_text_from_pdf(path):
-    with open(path, 'rb') as f:
-        reader = PyPDF2.PdfReader(f)
-        text = ""
-        for page in reader.pages:
-            content = page.extract_text()
-            if content:
-                text += content
-    return text
-
-def extract_skills(text):
-    SKILL_KEYWORDS = {
-        'technical': [
-            'machine learning', 'ai', 'data analysis', 'python', 'sql', 'java', 'c++',
-            'cybersecurity', 'cloud', 'git', 'django', 'javascript', 'tensorflow',
-            'pytorch', 'scikit-learn', 'data visualization', 'tableau', 'power bi'
-        ],
-        'soft': [
-            'problem solving', 'communication', 'leadership', 'project management',
-            'teamwork', 'creative thinking', 'critical thinking', 'time management'
-        ]
-    }
-    text_lower = text.lower()
-    found_skills = {'technical': [], 'soft': []}
-    for category, skills in SKILL_KEYWORDS.items():
-        for skill in skills:
-            if skill in text_lower:
-                found_skills[category].append(skill)
-    return found_skills
-
-# 2025 Market-Based Skill Importance (customize as needed)
-IMPORTANCE_WEIGHTS = {
-    'machine learning': 16,
-    'ai': 16,
-    'data analysis': 12,
-    'python': 9,
-    'problem solving': 9,
-    'communication': 9,
-    'leadership': 9,
-    'project management': 9,
-    'teamwork': 8,
-    'cybersecurity': 8,
-    'cloud': 8,
-    'sql': 7,
-    'creative thinking': 6,
-    'java': 40,     # Example: for Java developer, Java prioritized
-    'c++': 4,
-}
-
-def compute_job_weights(required_skills):
-    # Only use market importance for skills present in jobdesc, others divide leftover weight
-    weights = []
-    assigned = []
-    for skill in required_skills:
-        market_weight = IMPORTANCE_WEIGHTS.get(skill.lower())
-        if market_weight is not None:
-            weights.append(market_weight)
-            assigned.append(True)
-        else:
-            weights.append(None)
-            assigned.append(False)
-    total_assigned = sum(w for w in weights if w is not None)
-    missing_count = assigned.count(False)
-    # Distribute any leftover weight if some skills have no market mapping
-    default_weight = ((100 - total_assigned)/missing_count) if missing_count > 0 else 0
-    for i in range(len(weights)):
-        if weights[i] is None:
-            weights[i] = round(default_weight,1)
-    # Normalize in case of rounding errors
-    total = sum(weights)
-    weights = [round(w*100/total,1) for w in weights]
-    return dict(zip(required_skills, weights))
-
-def make_pie_chart(skills, weights, statuses):
-    # Create pie chart and save to BytesIO buffer
-    matched_weights = [weights[s] for s in skills if statuses[s] == 'Matched']
-    lacking_weights = [weights[s] for s in skills if statuses[s] == 'Lacking']
-    data = []
-    labels = []
-    colors_pie = []
-    for s in skills:
-        data.append(weights[s])
-        labels.append(f"{s.title()} ({statuses[s]})")
-        colors_pie.append("#27ae60" if statuses[s] == 'Matched' else "#c0392b")
-    plt.figure(figsize=(5.2,5.2))
-    plt.pie(data, labels=labels, colors=colors_pie, startangle=140, autopct='%.1f%%',
-            wedgeprops={"edgecolor":"white"}, textprops={'fontsize':10})
-    plt.title("Skill Market Weights (% matched/lacking)", fontsize=14, color='#0078D7')
-    buf = io.BytesIO()
-    plt.savefig(buf, format='png', bbox_inches='tight')
-    plt.close()
-    buf.seek(0)
-    return buf
+app.config['UPLOAD_TTL'] = 24 * 3600
+app.config['UPLOAD_QUOTA_BYTES'] = 5 * 1024 ** 3
+app.config['UPLOAD_EVICT_INTERVAL'] = 600
+app.config['UPLOAD_MAX_AGE'] = 365 * 24 * 3600
+# None serves uploads from Python; 'x-sendfile' or 'x-accel-redirect' lets a front proxy stream them
+app.config['UPLOAD_OFFLOAD'] = os.environ.get('SKILLGAP_UPLOAD_OFFLOAD') or None
+app.config['UPLOAD_ACCEL_PREFIX'] = '/protected-uploads/'
+# Per uploaded PDF; the whole request body is capped by MAX_CONTENT_LENGTH (which /bulk ZIPs also fall under)
+app.config['UPLOAD_MAX_BYTES'] = 20 * 1024 ** 2
+app.config['MAX_CONTENT_LENGTH'] = 512 * 1024 ** 2
+# Uploads are stored once per distinct content, sharded by sha256, and evicted when unreferenced
+upload_store = UploadStore(app.config['UPLOAD_FOLDER'], ttl=app.config['UPLOAD_TTL'],
+                           quota_bytes=app.config['UPLOAD_QUOTA_BYTES'],
+                           evict_interval=app.config['UPLOAD_EVICT_INTERVAL'])
+app.config['BULK_WORKERS'] = os.cpu_count() or 1
+# Each /bulk run has its own process pool of up to BULK_WORKERS; further runs are answered 429
+app.config['BULK_MAX_RUNNING'] = 2
+app.config['BULK_MAX_ZIP_MEMBERS'] = 5000
+bulk_slots = threading.BoundedSemaphore(app.config['BULK_MAX_RUNNING'])
+app.config['ANALYSIS_WORKERS'] = 4
+app.config['ANALYSIS_MAX_QUEUED'] = 32
+app.config['ANALYSIS_TIMEOUT'] = 120
+app.config['ANALYSIS_RETRY_AFTER'] = 5
+app.config['ANALYSIS_SSE_HEARTBEAT'] = 15
+# Start analysing as soon as files are uploaded, while the user is still on the preview page,
+# but only while the queue is at most this full so speculation never crowds out real requests
+app.config['ANALYSIS_SPECULATIVE'] = True
+app.config['ANALYSIS_SPECULATIVE_MAX_DEPTH'] = 8
+# A speculative job the session has not come back for (the preview, its PDFs or /analyze) within
+# this many seconds is taken as abandoned and cancelled; a queued one never starts
+app.config['ANALYSIS_SPECULATIVE_LEASE'] = 60
+app.config['ANALYSIS_MEMO_ENTRIES'] = 512
+app.config['RESULT_PAGE_ENTRIES'] = 256
+app.config['REPORT_PREBUILD'] = True
+app.config['SESSION_DB_PATH'] = os.path.join('cache', 'sessions.sqlite3')
+app.config['SESSION_STORE_TTL'] = 24 * 3600
+# How often a session using its uploads pushes their expiry forward again
+app.config['UPLOAD_REF_REFRESH'] = 3600
+# Session contents (including analysis_data) live server-side; the cookie only holds a signed id
+session_db = SqliteSessionStore(app.config['SESSION_DB_PATH'], ttl=app.config['SESSION_STORE_TTL'])
+app.session_interface = SqliteSessionInterface(session_db)
+# Per-request profiling (?profile=1 or an X-Profile header) is only honoured when this is on
+app.config['PROFILING_ENABLED'] = bool(os.environ.get('SKILLGAP_PROFILING'))
+app.config['PROFILE_TOP_FUNCTIONS'] = 30
+app.config['CANDIDATE_INDEX_PATH'] = os.path.join('cache', 'candidates.sqlite3')
+app.config['CANDIDATE_SEARCH_LIMIT'] = 50
+# The /admin endpoints (taxonomy status and reload) and /candidates/search answer 404 unless a
+# token is configured, and 403 unless it is sent in the X-Admin-Token header
+app.config['ADMIN_TOKEN'] = os.environ.get('SKILLGAP_ADMIN_TOKEN') or None
+# Every analyzed resume (from /analyze and /bulk) is added to a skill -> candidates index
+candidate_index = CandidateIndex(app.config['CANDIDATE_INDEX_PATH'])
+analysis_jobs = JobQueue(workers=app.config['ANALYSIS_WORKERS'],
+                         max_queued=app.config['ANALYSIS_MAX_QUEUED'],
+                         timeout=app.config['ANALYSIS_TIMEOUT'])
+# Builds the PDF report in the background once an analysis is shown, so the download is instant
+report_jobs = JobQueue(workers=1, max_queued=16, timeout=60)
 
 HTML_HOME = """
 <!DOCTYPE html>
@@ -131,11 +131,13 @@ HTML_HOME = """
             background-color: #0078D7; color: white; font-weight: 600; border: none; padding: 14px 36px; border-radius: 8px; cursor: pointer; font-size: 1.1rem; transition: background-color 0.2s;
         }
         .btn-main:hover, .btn-preview:hover { background-color: #005fa3; }
+        .error { background: #fdecea; color: #a93226; border-radius: 7px; padding: 12px 16px; margin: -16px 0 24px 0; }
     </style>
 </head>
 <body>
     <div class="container">
         <h1>Resume Skill Gap Analyzer</h1>
+        {% if error %}<p class="error">{{ error }}</p>{% endif %}
         <form action="/" method="post" enctype="multipart/form-data" id="upform">
             <div class="upload-box">
                 <label for="name">Your Name:</label>
@@ -198,6 +200,90 @@ HTML_PREVIEW = """
 </html>
 """
 
+HTML_WAIT = """
+<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8" />
+    <title>Analyzing - Resume Skill Gap Analyzer</title>
+    <style>
+        body { font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; background: #f4f7f8; color: #333; margin: 0; }
+        .container { max-width: 620px; margin: 80px auto; background: white; padding: 40px 35px; border-radius: 10px; box-shadow: 0 6px 25px rgba(0,0,0,0.1); text-align: center;}
+        h1 { color: #0078D7; margin-bottom: 20px;}
+        .status { color: #666; margin-bottom: 28px;}
+        .error { color: #c0392b; font-weight: 600; margin-bottom: 28px;}
+        .btn-cancel, .btn-retry { background-color: #c0392b; color: white; font-weight: 600; border: none; padding: 12px 34px; border-radius: 8px; cursor: pointer; font-size: 1rem; text-decoration: none;}
+        .btn-retry { background-color: #0078D7;}
+        .btn-back { margin-top: 22px; display: inline-block; text-decoration: none; color: #0078D7;}
+    </style>
+</head>
+<body>
+    <div class="container">
+        <h1>Analyzing Skills&hellip;</h1>
+        {% if error %}
+        <div class="error">{{ error }}</div>
+        <a class="btn-retry" href="{{ url_for('analyze', retry=1) }}">Try Again</a>
+        {% else %}
+        <div class="status" id="status">Status: {{ status }}</div>
+        <form action="{{ url_for('cancel_job', job_id=job_id) }}" method="post">
+            <input type="hidden" name="next" value="index">
+            <button class="btn-cancel" type="submit">Cancel</button>
+        </form>
+        {% endif %}
+        <a class="btn-back" href="{{ url_for('index') }}">&#8592; Back to upload</a>
+    </div>
+    {% if not error %}
+    <script>
+        const statusEl = document.getElementById('status');
+        function update(job) {
+            statusEl.textContent = 'Status: ' + job.status;
+            if (job.status !== 'queued' && job.status !== 'running') {
+                window.location.reload();
+                return true;
+            }
+            return false;
+        }
+        function poll() {
+            fetch("{{ url_for('job_status', job_id=job_id) }}")
+                .then(r => r.json())
+                .then(job => { if (!update(job)) setTimeout(poll, 1000); })
+                .catch(() => setTimeout(poll, 2000));
+        }
+        if (window.EventSource) {
+            const events = new EventSource("{{ url_for('job_events', job_id=job_id) }}");
+            events.addEventListener('status', e => { if (update(JSON.parse(e.data))) events.close(); });
+            events.onerror = () => { events.close(); poll(); };
+        } else {
+            poll();
+        }
+    </script>
+    {% endif %}
+</body>
+</html>
+"""
+
+HTML_BUSY = """
+<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8" />
+    <meta http-equiv="refresh" content="5" />
+    <title>Busy - Resume Skill Gap Analyzer</title>
+    <style>
+        body { font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; background: #f4f7f8; color: #333; margin: 0; }
+        .container { max-width: 620px; margin: 80px auto; background: white; padding: 40px 35px; border-radius: 10px; box-shadow: 0 6px 25px rgba(0,0,0,0.1); text-align: center;}
+        h1 { color: #0078D7; margin-bottom: 20px;}
+    </style>
+</head>
+<body>
+    <div class="container">
+        <h1>Server Busy</h1>
+        <p>{{ message }}. This page will retry automatically.</p>
+    </div>
+</body>
+</html>
+"""
+
 HTML_RESULT = """
 <!DOCTYPE html>
 <html lang="en">
@@ -223,6 +309,7 @@ HTML_RESULT = """
         .lacking-section { color:#c0392b; margin:18px 0 8px 0; font-size:1.03rem; font-weight:600;}
         .lacking-skill { color:#c0392b; font-weight:600;}
         .all-matched { color:#27ae60; font-weight:600;}
+        .text-warning { background:#fff3cd; color:#856404; border-radius:6px; padding:10px 14px; margin-bottom:12px; font-size:0.95rem;}
         .chart-container { width:100%; max-width:340px !important; margin:26px auto 36px auto;}
         .stats-grid { display: flex; gap: 14px; justify-content:center; flex-wrap: wrap;}
         .stat-box { flex:1; min-width:85px; text-align: center; padding: 14px 8px; background: #f9fafb; border-radius: 8px;}
@@ -254,6 +341,9 @@ HTML_RESULT = """
         <p>{{ user_email }}</p>
         <p style="color:#999; font-size:0.9rem;">Analysis Date: {{ analysis_date }}</p>
     </div>
+    {% for warning in text_warnings %}
+    <div class="text-warning">{{ warning }}</div>
+    {% endfor %}
     <div class="flex-split">
       <div class="column">
         <div class="section-title">Required Skills</div>
@@ -309,6 +399,10 @@ HTML_RESULT = """
                 <div class="stat-number">{{ pie_data[0] }}%</div>
                 <div class="stat-label">Suitability</div>
             </div>
+            <div class="stat-box">
+                <div class="stat-number">{{ similarity }}%</div>
+                <div class="stat-label">Text Similarity</div>
+            </div>
         </div>
         <div class="detailed-skills">
             <h3>Detailed Skills Breakdown</h3>
@@ -371,32 +465,154 @@ HTML_RESULT = """
 </html>
 """
 
+TEMPLATE_HOME = app.jinja_env.from_string(HTML_HOME)
+TEMPLATE_PREVIEW = app.jinja_env.from_string(HTML_PREVIEW)
+TEMPLATE_WAIT = app.jinja_env.from_string(HTML_WAIT)
+TEMPLATE_BUSY = app.jinja_env.from_string(HTML_BUSY)
+TEMPLATE_RESULT = app.jinja_env.from_string(HTML_RESULT)
+
+# Finished analyses keyed by (resume hash, JD hash, taxonomy version), and the
+# rendered result pages keyed by their ETag
+analysis_results = LRUCache(max_entries=app.config['ANALYSIS_MEMO_ENTRIES'])
+result_pages = LRUCache(max_entries=app.config['RESULT_PAGE_ENTRIES'])
+
+def render(template, **context):
+    # Like render_template_string, but for a template compiled once at startup
+    app.update_template_context(context)
+    with stage('template_render'):
+        return template.render(context)
+
+@app.before_request
+def _start_request_metrics():
+    g.request_start = time.perf_counter()
+    if app.config['PROFILING_ENABLED'] and (request.args.get('profile') or request.headers.get('X-Profile')):
+        registry.start_trace()
+        g.profiler = cProfile.Profile()
+        g.profiler.enable()
+
+@app.after_request
+def _finish_request_metrics(response):
+    elapsed = time.perf_counter() - g.request_start
+    observe('http_request_seconds', elapsed, endpoint=request.endpoint or 'unknown')
+    profiler = g.pop('profiler', None)
+    if profiler is None:
+        return response
+    profiler.disable()
+    trace = registry.stop_trace()
+    if response.is_streamed:
+        # The body has not been produced yet, so there is nothing meaningful to report
+        response.headers['X-Profile'] = 'skipped: streamed response'
+        return response
+    out = io.StringIO()
+    out.write(f"{request.method} {request.full_path} -> {response.status} in {elapsed * 1000:.1f}ms\n\nStages:\n")
+    for depth, name, seconds in trace:
+        out.write(f"{'  ' * (depth + 1)}{name:<{30 - 2 * depth}} {seconds * 1000:9.2f}ms\n")
+    out.write("\n")
+    pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(app.config['PROFILE_TOP_FUNCTIONS'])
+    profiled = make_response(out.getvalue())
+    profiled.headers['Content-Type'] = 'text/plain; charset=utf-8'
+    profiled.headers['X-Profiled-Status'] = str(response.status_code)
+    profiled.headers['Cache-Control'] = 'no-store'
+    return profiled
+
+def _session_owner():
+    sid = getattr(session, 'sid', None)
+    return f"session:{sid}" if sid else None
+
+def _keep_session_uploads():
+    # Sessions slide forward with every request, so the uploads they point at have to as well,
+    # or the evictor reclaims them while the session is still in use. At most once per UPLOAD_REF_REFRESH.
+    owner = _session_owner()
+    digests = [session[k] for k in ('resume_sha', 'jobdesc_sha') if session.get(k)]
+    now = time.time()
+    if not owner or not digests or now - session.get('uploads_refreshed', 0) < app.config['UPLOAD_REF_REFRESH']:
+        return
+    upload_store.set_refs(owner, digests, ttl=app.config['SESSION_STORE_TTL'])
+    for digest in digests:
+        upload_store.touch(digest)
+    session['uploads_refreshed'] = now
+
+def _result_etag(key, user_name, user_email, analysis_date, timed_out=False):
+    payload = json.dumps([list(key), user_name, user_email, analysis_date, timed_out]).encode('utf-8')
+    return hashlib.sha256(payload).hexdigest()
+
+def _renew_analysis_lease():
+    # The session is still around, so its speculative job is still wanted
+    job = analysis_jobs.get(session.get('analysis_job', ''))
+    if job is not None:
+        job.renew(app.config['ANALYSIS_SPECULATIVE_LEASE'])
+
+def _start_analysis_early(resume_digest, jobdesc_digest):
+    # Queues the analysis /analyze would start, so it is usually finished by the time it is asked for.
+    # A job still running for this session's previous uploads is no longer wanted and is cancelled;
+    # one the session never comes back for lapses after ANALYSIS_SPECULATIVE_LEASE.
+    key = analysis_key(resume_digest, jobdesc_digest)
+    previous = analysis_jobs.get(session.get('analysis_job', ''))
+    if previous is not None and previous.key != key:
+        previous.cancel()
+        session.pop('analysis_job', None)
+    elif previous is not None and previous.poll() not in (CANCELLED, TIMEOUT, FAILED):
+        previous.renew(app.config['ANALYSIS_SPECULATIVE_LEASE'])
+        return
+    if not app.config['ANALYSIS_SPECULATIVE'] or key in analysis_results:
+        return
+    if analysis_jobs.depth() > app.config['ANALYSIS_SPECULATIVE_MAX_DEPTH']:
+        return
+    try:
+        job = analysis_jobs.submit(_analysis_job, upload_store.path_for(resume_digest),
+                                   upload_store.path_for(jobdesc_digest), resume_digest, jobdesc_digest, key=key,
+                                   lease=app.config['ANALYSIS_SPECULATIVE_LEASE'])
+    except QueueFull:
+        return  # /analyze will submit it (or report the queue as busy) when asked
+    session['analysis_job'] = job.id
+
+def _accept_pdf_uploads(count):
+    # Must run before the form is first touched. Requests declaring a larger body are refused
+    # before any of it is read; the rest are streamed into the upload store and checked as they arrive.
+    request.max_content_length = count * app.config['UPLOAD_MAX_BYTES'] + UPLOAD_FORM_OVERHEAD
+    request.upload_target = upload_store
+    request.upload_max_bytes = app.config['UPLOAD_MAX_BYTES']
+
+def _upload_limit_message():
+    return f"Each PDF may be at most {app.config['UPLOAD_MAX_BYTES'] / 1024 ** 2:.3g} MB"
+
 @app.route("/", methods=["GET", "POST"])
 def index():
     if request.method == "POST":
-        action = request.form.get("action")
+        _accept_pdf_uploads(2)
+        try:
+            action = request.form.get("action")
+            resume_file = request.files.get('resume')
+            jobdesc_file = request.files.get('jobdesc')
+            if not resume_file or not jobdesc_file:
+                return render(TEMPLATE_HOME)
+            resume_digest, _ = upload_store.save(resume_file)
+            jobdesc_digest, _ = upload_store.save(jobdesc_file)
+        except RequestEntityTooLarge:
+            return make_response(render(TEMPLATE_HOME, error=_upload_limit_message()), 413)
+        except UploadRejected as e:
+            return make_response(render(TEMPLATE_HOME, error=str(e)), e.status)
         name = request.form.get("name", "")
         email = request.form.get("email", "")
-        resume_file = request.files.get('resume')
-        jobdesc_file = request.files.get('jobdesc')
-        if not resume_file or not jobdesc_file:
-            return render_template_string(HTML_HOME)
-        resume_filename = secure_filename(str(uuid.uuid4()) + '_' + resume_file.filename)
-        jobdesc_filename = secure_filename(str(uuid.uuid4()) + '_' + jobdesc_file.filename)
-        resume_path = os.path.join(app.config['UPLOAD_FOLDER'], resume_filename)
-        jobdesc_path = os.path.join(app.config['UPLOAD_FOLDER'], jobdesc_filename)
-        resume_file.save(resume_path)
-        jobdesc_file.save(jobdesc_path)
-        session['resume'] = resume_filename
-        session['jobdesc'] = jobdesc_filename
+        owner = _session_owner()
+        if owner:
+            # Replaces this session's previous uploads, which become evictable
+            upload_store.set_refs(owner, [resume_digest, jobdesc_digest], ttl=app.config['SESSION_STORE_TTL'])
+            session['uploads_refreshed'] = time.time()
+        session['resume'] = upload_store.name_for(resume_digest)
+        session['jobdesc'] = upload_store.name_for(jobdesc_digest)
+        session['resume_sha'] = resume_digest
+        session['jobdesc_sha'] = jobdesc_digest
         session['user_name'] = name
         session['user_email'] = email
+        session.pop('analysis_key', None)
+        _start_analysis_early(resume_digest, jobdesc_digest)
 
         if action == "preview":
             return redirect(url_for('preview'))
         elif action == "analyze":
             return redirect(url_for('analyze'))
-    return render_template_string(HTML_HOME)
+    return render(TEMPLATE_HOME)
 
 @app.route("/preview", methods=["GET"])
 def preview():
@@ -404,13 +620,53 @@ def preview():
     jobdesc_filename = session.get('jobdesc')
     if not resume_filename or not jobdesc_filename:
         return redirect(url_for('index'))
-    return render_template_string(HTML_PREVIEW,
+    _keep_session_uploads()
+    _renew_analysis_lease()
+    return render(TEMPLATE_PREVIEW,
                                  resume_filename=resume_filename,
                                  jobdesc_filename=jobdesc_filename)
 
 @app.route('/uploads/<filename>')
 def uploaded_file(filename):
-    return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
+    # Upload names are content hashes, so the bytes behind a URL never change:
+    # the digest is a strong ETag and browsers may cache the file forever.
+    path = upload_store.path_for_name(filename)
+    if path is None or not os.path.exists(path):
+        abort(404)
+    digest = filename[:-len('.pdf')]
+    if digest in (session.get('resume_sha'), session.get('jobdesc_sha')):
+        _keep_session_uploads()
+        _renew_analysis_lease()
+    if request.if_none_match.contains(digest):
+        response = make_response('', 304)
+    elif app.config['UPLOAD_OFFLOAD'] == 'x-accel-redirect':
+        # nginx streams the file (including Range requests) from an internal location
+        response = make_response('')
+        response.headers['Content-Type'] = 'application/pdf'
+        response.headers['X-Accel-Redirect'] = app.config['UPLOAD_ACCEL_PREFIX'] + os.path.relpath(path, upload_store.root).replace(os.sep, '/')
+    else:
+        # Range and If-Range are handled by send_file; 'x-sendfile' hands the path to the front server instead
+        response = werkzeug.utils.send_file(path, request.environ, mimetype='application/pdf', etag=digest,
+                                            conditional=True, response_class=app.response_class,
+                                            use_x_sendfile=app.config['UPLOAD_OFFLOAD'] == 'x-sendfile')
+        response.headers['Accept-Ranges'] = 'bytes'
+    response.set_etag(digest)
+    response.headers['Cache-Control'] = f"private, max-age={app.config['UPLOAD_MAX_AGE']}, immutable"
+    return response
+
+def _prebuild_report(job, data):
+    from report import report_pdf
+    report_pdf(data)
+
+def _analysis_job(job, resume_path, jobdesc_path, resume_digest, jobdesc_digest):
+    data = run_analysis(resume_path, jobdesc_path, check=job.check,
+                        resume_digest=resume_digest, jobdesc_digest=jobdesc_digest)
+    # Memoised under the taxonomy and similarity model the analysis actually used, in case either was
+    # swapped meanwhile; text cut short by the time budget is not, so a later request reads the documents again
+    if not data['text_timed_out']:
+        key = analysis_key(resume_digest, jobdesc_digest, data['taxonomy_version'], data['similarity_version'])
+        analysis_results.set(key, data)
+    return data
 
 @app.route("/analyze", methods=["GET", "POST"])
 def analyze():
@@ -418,70 +674,194 @@ def analyze():
     jobdesc_filename = session.get('jobdesc')
     user_name = session.get('user_name', 'User')
     user_email = session.get('user_email', '')
-    if not resume_filename or not jobdesc_filename:
+    resume_path = upload_store.path_for_name(resume_filename)
+    jobdesc_path = upload_store.path_for_name(jobdesc_filename)
+    if not resume_path or not jobdesc_path:
         return redirect(url_for('index'))
-    resume_path = os.path.join(app.config['UPLOAD_FOLDER'], resume_filename)
-    jobdesc_path = os.path.join(app.config['UPLOAD_FOLDER'], jobdesc_filename)
-    resume_text = extract_text_from_pdf(resume_path)
-    jobdesc_text = extract_text_from_pdf(jobdesc_path)
-    resume_skills = extract_skills(resume_text)
-    jobdesc_skills = extract_skills(jobdesc_text)
-    resume_all = set(resume_skills['technical'] + resume_skills['soft'])
-    jobdesc_all = set(jobdesc_skills['technical'] + jobdesc_skills['soft'])
-    matching_skills = sorted(resume_all & jobdesc_all)
-    required_skills = sorted(jobdesc_all)
-    lacking_skills = sorted(jobdesc_all - resume_all)
-    matched_count = len(matching_skills)
-    lacking_count = len(lacking_skills)
-    total_skills = len(required_skills)
-    weights = compute_job_weights(required_skills)
-
-    status_map = {}
-    for skill in required_skills:
-        if skill in matching_skills:
-            status_map[skill] = 'Matched'
-        else:
-            status_map[skill] = 'Lacking'
-
-    matched_percent = sum(weights[skill] for skill in matching_skills)
-    lacking_percent = sum(weights[skill] for skill in lacking_skills)
-    detailed_skills = [{'name': skill.title(), 'percent': round(weights[skill], 1)} for skill in required_skills]
-    pie_data = [round(matched_percent, 1), round(lacking_percent, 1)]
-    pie_colors = ["#27ae60", "#c0392b"]
-    pie_labels = ["Matched %", "Lacking %"]
+    _keep_session_uploads()
+    resume_digest = session['resume_sha']
+    jobdesc_digest = session['jobdesc_sha']
+    key = analysis_key(resume_digest, jobdesc_digest)
+    data = analysis_results.get(key)
+    if data is None and 'profiler' in g:
+        # Profiling only sees this thread, so run the analysis here rather than in the job queue
+        data = run_analysis(resume_path, jobdesc_path, resume_digest=resume_digest, jobdesc_digest=jobdesc_digest)
+        if not data['text_timed_out']:
+            analysis_results.set(key, data)
+    if data is None:
+        job = analysis_jobs.get(session.get('analysis_job', ''))
+        # A speculative job that lapsed before the user got here is simply started again
+        if job is None or job.key != key or (job.poll() in (CANCELLED, TIMEOUT, FAILED)
+                                             and (request.args.get('retry') or job.lapsed())):
+            try:
+                job = analysis_jobs.submit(_analysis_job, resume_path, jobdesc_path, resume_digest, jobdesc_digest, key=key)
+            except QueueFull as e:
+                response = make_response(render(TEMPLATE_BUSY, message=str(e)), 429)
+                response.headers['Retry-After'] = str(app.config['ANALYSIS_RETRY_AFTER'])
+                return response
+            session['analysis_job'] = job.id
+        job.claim()
+        status = job.poll()
+        if status != DONE:
+            return render(TEMPLATE_WAIT, job_id=job.id, status=status, error=job.error)
+        data = job.result
 
     # Save analysis data for PDF generation
-    session['analysis_data'] = {
-        'user_name': user_name,
-        'user_email': user_email,
-        'resume_all_skills': sorted(resume_all),
-        'matching_skills': matching_skills,
-        'missing_skills': lacking_skills,
-        'required_skills': required_skills,
-        'matched_count': matched_count,
-        'lacking_count': lacking_count,
-        'total_skills': total_skills,
-        'pie_data': pie_data,
-        'detailed_skills': detailed_skills,
-        'weights': weights,
-        'status_map': status_map
-    }
-    return render_template_string(HTML_RESULT,
-        user_name=user_name,
-        user_email=user_email,
-        analysis_date=datetime.now().strftime("%B %d, %Y"),
-        resume_all_skills=sorted(resume_all),
-        matching_skills=matching_skills,
-        missing_skills=lacking_skills,
-        required_skills=required_skills,
-        matched_count=matched_count,
-        lacking_count=lacking_count,
-        total_skills=total_skills,
-        pie_data=pie_data,
-        pie_colors=pie_colors,
-        pie_labels=pie_labels,
-        detailed_skills=detailed_skills
-    )
+    if session.get('analysis_key') != list(key):
+        session['analysis_data'] = dict(data, user_name=user_name, user_email=user_email)
+        session['analysis_key'] = list(key)
+        candidate_index.add(resume_digest, data['resume_all_skills'], name=user_name, email=user_email, source='analyze')
+        if app.config['REPORT_PREBUILD']:
+            try:
+                report_jobs.submit(_prebuild_report, session['analysis_data'])
+            except QueueFull:
+                pass  # the download will build it on demand
+
+    analysis_date = datetime.now().strftime("%B %d, %Y")
+    etag = _result_etag(key, user_name, user_email, analysis_date, data.get('text_timed_out', False))
+    if request.method == "GET" and request.if_none_match.contains(etag):
+        response = make_response('', 304)
+    else:
+        page = result_pages.get(etag)
+        if page is None:
+            page = render(TEMPLATE_RESULT,
+                user_name=user_name,
+                user_email=user_email,
+                analysis_date=analysis_date,
+                resume_all_skills=data['resume_all_skills'],
+                matching_skills=data['matching_skills'],
+                missing_skills=data['missing_skills'],
+                required_skills=data['required_skills'],
+                matched_count=data['matched_count'],
+                lacking_count=data['lacking_count'],
+                total_skills=data['total_skills'],
+                pie_data=data['pie_data'],
+                similarity=data['similarity'],
+                text_warnings=data.get('text_warnings', []),
+                pie_colors=["#27ae60", "#c0392b"],
+                pie_labels=["Matched %", "Lacking %"],
+                detailed_skills=data['detailed_skills']
+            )
+            result_pages.set(etag, page)
+        response = make_response(page)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def job_status(job_id):
+    job = analysis_jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    return jsonify(job.to_dict())
+
+@app.route("/jobs/<job_id>/events", methods=["GET"])
+def job_events(job_id):
+    # Server-sent events: one 'status' event per change, ending once the job is finished
+    job = analysis_jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    def stream():
+        last = None
+        while True:
+            status = job.wait(timeout=app.config['ANALYSIS_SSE_HEARTBEAT'])
+            if status != last:
+                last = status
+                yield f"event: status\ndata: {json.dumps(job.to_dict())}\n\n"
+            else:
+                yield ": keep-alive\n\n"
+            if status in FINISHED_STATES:
+                return
+    return Response(stream(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
+
+@app.route("/jobs/<job_id>/cancel", methods=["POST"])
+def cancel_job(job_id):
+    job = analysis_jobs.cancel(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    if request.form.get('next') == 'index':
+        return redirect(url_for('index'))
+    return jsonify(job.to_dict())
+
+@app.route("/bulk", methods=["POST"])
+def bulk():
+    # One job description against many resumes (PDFs and/or ZIPs of PDFs), streamed back per candidate
+    if not bulk_slots.acquire(blocking=False):
+        response = make_response("Too many bulk screenings are running; try again shortly", 429)
+        response.headers['Retry-After'] = str(app.config['ANALYSIS_RETRY_AFTER'])
+        return response
+    try:
+        response = _bulk()
+    except BaseException:
+        bulk_slots.release()
+        raise
+    if response.is_streamed:
+        # Released when the server closes the response, including when the client goes away early
+        response.call_on_close(bulk_slots.release)
+    else:
+        bulk_slots.release()
+    return response
+
+def _bulk():
+    # PDFs (the job description and plain resumes) get the same streaming size cap and checks as
+    # the upload form; ZIPs are left to MAX_CONTENT_LENGTH and check_zip
+    request.upload_target = upload_store
+    request.upload_max_bytes = app.config['UPLOAD_MAX_BYTES']
+    request.upload_passthrough = ('.zip',)
+    try:
+        jobdesc_file = request.files.get('jobdesc')
+        resume_files = request.files.getlist('resumes')
+    except UploadRejected as e:
+        return make_response(str(e), e.status)
+    if not jobdesc_file or not resume_files:
+        return make_response("Upload a 'jobdesc' PDF and one or more 'resumes' (PDF or ZIP)", 400)
+    try:
+        jobdesc_digest, _ = upload_store.save(jobdesc_file, max_bytes=app.config['UPLOAD_MAX_BYTES'])
+    except UploadRejected as e:
+        return make_response(f"jobdesc: {e}", e.status)
+    upload_store.add_ref(f"bulk:{jobdesc_digest}", jobdesc_digest)
+    jobdesc_path = upload_store.path_for(jobdesc_digest)
+    try:
+        job = prepare_job(jobdesc_path)
+    except ValueError as e:
+        return make_response(str(e), 422)
+    workers = min(request.args.get('workers', app.config['BULK_WORKERS'], type=int), app.config['BULK_WORKERS'])
+    try:
+        results = screen_upload(jobdesc_path, resume_files, workers=max(workers, 1), job=job,
+                                max_zip_members=app.config['BULK_MAX_ZIP_MEMBERS'],
+                                max_member_bytes=app.config['UPLOAD_MAX_BYTES'])
+    except ArchiveRejected as e:
+        return make_response(str(e), 413)
+    except UploadRejected as e:
+        return make_response(str(e), e.status)
+    results = index_results(candidate_index, results, source=f"bulk:{jobdesc_digest}")
+    if request.args.get('format') == 'csv':
+        return Response(stream_with_context(to_csv(results)), mimetype='text/csv',
+                        headers={'Content-Disposition': 'attachment; filename=screening.csv'})
+    return Response(stream_with_context(to_ndjson(results)), mimetype='application/x-ndjson')
+
+@app.route("/candidates/search", methods=["GET"])
+def candidate_search():
+    # ?q=python AND sql NOT cloud, optionally &rank=python:2,sql to weight the ordering;
+    # without rank, matches are ordered by the market weights of the queried skills
+    # Lists every indexed candidate's name, email and skills, so it is an admin endpoint
+    _check_admin()
+    all_of, any_of, none_of = parse_query(request.args.get('q', ''))
+    if not (all_of or any_of or none_of):
+        return jsonify({'error': "Pass a query such as q=python AND sql NOT cloud"}), 400
+    rank = {}
+    for item in filter(None, request.args.get('rank', '').split(',')):
+        skill, _, weight = item.partition(':')
+        try:
+            rank[skill.strip().lower()] = float(weight) if weight else 1.0
+        except ValueError:
+            return jsonify({'error': f"Bad rank weight: {item}"}), 400
+    if not rank and (all_of or any_of):
+        rank = compute_job_weights(sorted(set(all_of + any_of)))
+    limit = min(request.args.get('limit', app.config['CANDIDATE_SEARCH_LIMIT'], type=int), 1000)
+    result = candidate_index.query(all_of, any_of, none_of, rank=rank, limit=max(limit, 1))
+    result['query'] = {'all': all_of, 'any': any_of, 'not': none_of, 'rank': rank}
+    return jsonify(result)
 
 @app.route("/download_pdf", methods=["POST"])
 def download_pdf():
@@ -489,88 +869,72 @@ def download_pdf():
     if not data:
         return redirect(url_for('index'))
 
-    buf_img = make_pie_chart(
-        data['required_skills'],
-        data['weights'],
-        data['status_map']
-    )
-
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=letter, rightMargin=50, leftMargin=50, topMargin=50, bottomMargin=50)
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle('CustomTitle', parent=styles['Heading1'], fontSize=20, textColor=colors.HexColor('#0078D7'), spaceAfter=12, alignment=1)
-    heading_style = ParagraphStyle('CustomHeading', parent=styles['Heading2'], fontSize=14, textColor=colors.HexColor('#0078D7'), spaceAfter=10)
-    normal_style = styles['Normal']
-    story = []
-    story.append(Paragraph("Skill Gap Analysis Report", title_style))
-    story.append(Spacer(1, 0.2 * inch))
-    story.append(Paragraph(f"<b>Candidate:</b> {data['user_name']}", normal_style))
-    story.append(Paragraph(f"<b>Email:</b> {data['user_email']}", normal_style))
-    story.append(Paragraph(f"<b>Analysis Date:</b> {datetime.now().strftime('%B %d, %Y')}", normal_style))
-    story.append(Spacer(1, 0.3 * inch))
-    story.append(Paragraph("Summary Statistics", heading_style))
-    summary_data = [
-        ['Metric', 'Value'],
-        ['Total Skills Required', str(data['total_skills'])],
-        ['Skills Matched', str(data['matched_count'])],
-        ['Skills Lacking', str(data['lacking_count'])],
-        ['Suitability (%)', f"{data['pie_data'][0]}%"]
-    ]
-    summary_table = Table(summary_data, colWidths=[3 * inch, 2 * inch])
-    summary_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#0078D7')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 12),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('GRID', (0, 0), (-1, -1), 1, colors.grey)
-    ]))
-    story.append(summary_table)
-    story.append(Spacer(1, 0.3 * inch))
-    story.append(Paragraph("Skill Distribution Pie Chart (Market Weights)", heading_style))
-    story.append(Image(buf_img, width=4*inch, height=4*inch))
-    story.append(Spacer(1, 0.3 * inch))
-    story.append(Paragraph("Required Skills", heading_style))
-    story.append(Paragraph(", ".join(data['required_skills']), normal_style))
-    story.append(Spacer(1, 0.2 * inch))
-    story.append(Paragraph("Matched Skills", heading_style))
-    if data['matching_skills']:
-        story.append(Paragraph(", ".join(data['matching_skills']), normal_style))
-    else:
-        story.append(Paragraph("No skills matched", normal_style))
-    story.append(Spacer(1, 0.2 * inch))
-    story.append(Paragraph("Lacking Skills", heading_style))
-    if data['missing_skills']:
-        story.append(Paragraph(", ".join(data['missing_skills']), normal_style))
-    else:
-        story.append(Paragraph("All required skills are matched!", normal_style))
-    story.append(Spacer(1, 0.3 * inch))
-    story.append(Paragraph("Detailed Skills Breakdown (Weights per market)", heading_style))
-    skills_data = [['Skill', 'Weight %', 'Status']]
-    for skill in data['detailed_skills']:
-        status = 'Matched' if skill['name'].lower() in [s.lower() for s in data['matching_skills']] else 'Lacking'
-        skills_data.append([skill['name'], f"{skill['percent']}%", status])
-    skills_table = Table(skills_data, colWidths=[2.5 * inch, 1.5 * inch, 1.5 * inch])
-    skills_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#0078D7')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 11),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('GRID', (0, 0), (-1, -1), 1, colors.grey),
-        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.lightgrey])
-    ]))
-    story.append(skills_table)
-    doc.build(story)
-    buffer.seek(0)
-    response = make_response(buffer.getvalue())
+    # ReportLab is only needed here, so it is imported on first download rather than at startup
+    from report import report_pdf
+    with stage('report'):
+        pdf_bytes = report_pdf(data)
+    response = make_response(pdf_bytes)
     response.headers['Content-Type'] = 'application/pdf'
     response.headers['Content-Disposition'] = f'attachment; filename=Skill_Gap_Analysis_{data["user_name"].replace(" ", "_")}.pdf'
     return response
 
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    # Prometheus text format: stage/request histograms plus cache, queue and store gauges.
+    # Histograms are per process; scrape each worker (or run one process) for complete numbers.
+    gauges = {}
+    gauges.update(flatten_snapshot('analysis_memo', analysis_results.snapshot()))
+    gauges.update(flatten_snapshot('result_pages', result_pages.snapshot()))
+    gauges.update(flatten_snapshot('pdf_text_cache', pdf_text_cache.snapshot()))
+    gauges.update(flatten_snapshot('analysis_jobs', analysis_jobs.snapshot()))
+    gauges.update(flatten_snapshot('report_jobs', report_jobs.snapshot()))
+    gauges.update(flatten_snapshot('uploads', upload_store.snapshot()))
+    gauges.update(flatten_snapshot('sessions', session_db.snapshot()))
+    gauges.update(flatten_snapshot('candidate_index', candidate_index.snapshot()))
+    gauges.update(flatten_snapshot('taxonomy', current_taxonomy().snapshot()))
+    gauges['similarity_idf_documents'] = similarity.current().documents
+    report = sys.modules.get('report')
+    if report is not None:
+        gauges.update(flatten_snapshot('report_cache', report.report_cache.snapshot()))
+        gauges.update(flatten_snapshot('report', report.build_stats))
+    return Response(registry.render(gauges), mimetype='text/plain; version=0.0.4')
+
+def _check_admin():
+    token = app.config['ADMIN_TOKEN']
+    if not token:
+        abort(404)
+    if not hmac.compare_digest(request.headers.get('X-Admin-Token', ''), token):
+        abort(403)
+
+@app.route("/admin/taxonomy", methods=["GET"])
+def taxonomy_status():
+    _check_admin()
+    return jsonify(dict(current_taxonomy().snapshot(), source=taxonomy.TAXONOMY_PATH))
+
+@app.route("/admin/taxonomy/reload", methods=["POST"])
+def taxonomy_reload():
+    # Recompiles and swaps in the taxonomy file now instead of waiting for the periodic check.
+    # Each worker process holds its own mapping, so post this to every worker (or rely on the check).
+    _check_admin()
+    previous = current_taxonomy().version
+    try:
+        loaded = taxonomy.reload()
+    except (OSError, taxonomy.TaxonomyError) as e:
+        return jsonify({'error': str(e), 'version': previous}), 400
+    return jsonify(dict(loaded.snapshot(), previous=previous, source=taxonomy.TAXONOMY_PATH))
+
+def warm_up():
+    # Pre-imports and pre-builds everything that is otherwise loaded lazily on
+    # first use. Call it from a pre-fork master (for example under gunicorn
+    # --preload with SKILLGAP_WARMUP=1) so forked workers share those pages.
+    import PyPDF2
+    import report
+    report.make_pie_chart(['python', 'sql'], {'python': 50.0, 'sql': 50.0}, {'python': 'Matched', 'sql': 'Lacking'})
+    report.pie_charts.clear()
+    current_taxonomy()
+
+if os.environ.get('SKILLGAP_WARMUP'):
+    warm_up()
+
 if __name__ == "__main__":
     app.run(debug=True)
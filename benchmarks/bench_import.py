@@ -0,0 +1,70 @@
+# Import-time report for app.py, and a guard against slow cold starts.
+#
+#   python benchmarks/bench_import.py [--budget-ms 600] [--top 15]
+#
+# Runs `import app` in a fresh interpreter under -X importtime, prints the
+# slowest modules by cumulative time and exits non-zero if the import takes
+# longer than the budget or pulls in a dependency that should be lazy.
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Only needed by /download_pdf or the first PDF parse, never at import
+LAZY_MODULES = ['reportlab', 'PyPDF2', 'matplotlib']
+
+
+def import_profile():
+    code = f"import sys; sys.path.insert(0, {REPO!r}); import app"
+    env = dict(os.environ)
+    env.pop('SKILLGAP_WARMUP', None)
+    # app.py creates its upload folder in the working directory
+    with tempfile.TemporaryDirectory() as cwd:
+        proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                              cwd=cwd, env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        sys.exit(proc.stderr)
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        parts = line[len('import time:'):].split('|')
+        rows.append((int(parts[1]), int(parts[0]), parts[2].rstrip()))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--budget-ms', type=float, default=600.0)
+    parser.add_argument('--top', type=int, default=15)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    runs = [import_profile() for _ in range(args.repeat)]
+    # The fastest run is the least disturbed by the rest of the machine
+    rows = min(runs, key=lambda r: max((c for c, _s, n in r if n.strip() == 'app'), default=0))
+    total_us = max((c for c, _s, n in rows if n.strip() == 'app'), default=0)
+
+    print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+    for cumulative, self_us, name in sorted(rows, reverse=True)[:args.top]:
+        print(f"{cumulative / 1000:14.1f} {self_us / 1000:9.1f}  {name}")
+    print(f"\nimport app: {total_us / 1000:.1f}ms (budget {args.budget_ms:.0f}ms)")
+
+    failures = []
+    imported = set(n.strip().split('.')[0] for _c, _s, n in rows)
+    for module in LAZY_MODULES:
+        if module in imported:
+            failures.append(f"{module} is imported at startup but should be loaded lazily")
+    if total_us / 1000 > args.budget_ms:
+        failures.append(f"import took {total_us / 1000:.1f}ms, over the {args.budget_ms:.0f}ms budget")
+    for failure in failures:
+        print("FAIL:", failure)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+# Checks the vectorized ScoringEngine against score_candidate (and its top-k
+# tie order against a full sort) and times it on a synthetic N-resumes x M-jobs grid.
+#
+#   python benchmarks/bench_scoring.py [--resumes 100000] [--jobs 1000] [--k 10]
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analysis import compute_job_weights, current_taxonomy, score_candidate
+from scoring import ScoringEngine
+
+
+def random_skill_sets(count, rng, low, high):
+    skills = current_taxonomy().skills
+    return [set(rng.sample(skills, rng.randint(low, high))) for _ in range(count)]
+
+
+def check_parity(engine, rng, resumes=300, jobs=60):
+    resume_sets = random_skill_sets(resumes, rng, 0, 12)
+    job_sets = random_skill_sets(jobs, rng, 1, 12)
+    grid = engine.score(engine.encode(resume_sets), engine.encode_jobs(job_sets))
+    for m, job in enumerate(job_sets):
+        required = sorted(job)
+        weights = compute_job_weights(required)
+        for n, resume in enumerate(resume_sets):
+            expected = score_candidate(resume, required, weights)
+            got = round(float(grid['suitability'][n, m]), 1)
+            if got != expected['suitability'] or int(grid['matched_count'][n, m]) != expected['matched_count'] \
+                    or int(grid['lacking_count'][n, m]) != expected['lacking_count']:
+                sys.exit(f"mismatch for resume {n}, job {m}: {got} vs {expected}")
+    print(f"parity: {resumes} x {jobs} pairs match score_candidate")
+
+
+def check_top_k(engine, rng, k, resumes=500, jobs=40):
+    # Small skill sets make many equal scores; small blocks make the merge across blocks matter
+    resume_matrix = engine.encode(random_skill_sets(resumes, rng, 0, 3))
+    job_matrix = engine.encode_jobs(random_skill_sets(jobs, rng, 1, 4))
+    grid = engine.score(resume_matrix, job_matrix)['suitability']
+    idx, _scores = engine.top_candidates(resume_matrix, job_matrix, k=k, chunk_size=37)
+    for m in range(jobs):
+        expected = sorted(range(resumes), key=lambda n: (-grid[n, m], n))[:k]
+        if list(idx[m]) != expected:
+            sys.exit(f"top_candidates for job {m}: {list(idx[m])} vs {expected}")
+    idx, _scores = engine.top_jobs(resume_matrix, job_matrix, k=k, chunk_size=37)
+    for n in range(resumes):
+        expected = sorted(range(jobs), key=lambda m: (-grid[n, m], m))[:k]
+        if list(idx[n]) != expected:
+            sys.exit(f"top_jobs for resume {n}: {list(idx[n])} vs {expected}")
+    print(f"top-{k}: ties ordered by index on {resumes} x {jobs} pairs")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--resumes', type=int, default=100000)
+    parser.add_argument('--jobs', type=int, default=1000)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+    engine = ScoringEngine()
+
+    check_parity(engine, rng)
+    check_top_k(engine, rng, args.k)
+
+    start = time.perf_counter()
+    resumes = engine.encode(random_skill_sets(args.resumes, rng, 0, 12))
+    jobs = engine.encode_jobs(random_skill_sets(args.jobs, rng, 1, 12))
+    encoded = time.perf_counter() - start
+
+    start = time.perf_counter()
+    engine.top_candidates(resumes, jobs, k=args.k)
+    by_job = time.perf_counter() - start
+
+    start = time.perf_counter()
+    engine.top_jobs(resumes, jobs, k=args.k)
+    by_resume = time.perf_counter() - start
+
+    print(f"{args.resumes} resumes x {args.jobs} jobs: encode {encoded:.2f}s, "
+          f"top-{args.k} candidates per job {by_job:.2f}s, top-{args.k} jobs per resume {by_resume:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+# Checks batched TF-IDF similarity against the per-pair path and times both
+# on synthetic resumes: the per-request cost of /analyze and one job
+# description against many resumes.
+#
+#   python benchmarks/bench_similarity.py [--resumes 5000] [--words 600]
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analysis import current_taxonomy
+from similarity import TfidfModel, build_idf
+
+FILLER = ('responsible for delivering quarterly results across several teams while maintaining documentation '
+          'reviewing designs supporting customers improving internal processes building neural networks '
+          'training models deploying services on kubernetes writing reports mentoring junior engineers').split()
+
+
+def random_text(rng, words):
+    skills = current_taxonomy().skills
+    return ' '.join(rng.choice(skills) if rng.random() < 0.1 else rng.choice(FILLER) for _ in range(words))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--resumes', type=int, default=5000)
+    parser.add_argument('--words', type=int, default=600, help="words per synthetic resume")
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    resumes = [random_text(rng, rng.randint(args.words // 2, args.words * 2)) for _ in range(args.resumes)]
+    jobdesc = random_text(rng, 300)
+    start = time.perf_counter()
+    idf, documents = build_idf(resumes[:1000] + [jobdesc])
+    model = TfidfModel(idf, documents=documents)
+    print(f"IDF table over {documents} documents in {time.perf_counter() - start:.2f}s")
+
+    # Batch scores must equal the per-pair scores /analyze computes
+    sample = resumes[:200]
+    batch = model.similarities(model.transform(sample), model.vector(jobdesc))
+    worst = max(abs(float(b) - model.similarity(text, jobdesc)) for b, text in zip(batch, sample))
+    if worst > 1e-5:
+        sys.exit(f"batch and per-pair similarity differ by {worst}")
+    print(f"parity: {len(sample)} batch scores match per-pair similarity (max diff {worst:.1e})")
+
+    times = []
+    for text in resumes[:args.repeat]:
+        start = time.perf_counter()
+        model.similarity(text, jobdesc)
+        times.append(time.perf_counter() - start)
+    print(f"per request (resume + job description): median {statistics.median(times) * 1000:.2f}ms")
+
+    start = time.perf_counter()
+    rows = model.transform(resumes)
+    transformed = time.perf_counter() - start
+    start = time.perf_counter()
+    scores = model.similarities(rows, model.vector(jobdesc))
+    scored = time.perf_counter() - start
+    print(f"1 job x {args.resumes} resumes: vectorize {transformed:.2f}s, score {scored * 1000:.1f}ms "
+          f"({rows.indptr[-1] / len(rows):.0f} nonzeros per resume, best {scores.max():.3f})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+# Checks the compiled taxonomy matcher against a plain token n-gram lookup and
+# times it against the substring loop extract_skills used before it, on the
+# bundled taxonomy and on a synthetic one. Also reports what loading a compiled
+# taxonomy costs each process on top of the shared mapping.
+#
+#   python benchmarks/bench_skill_matcher.py [--skills 10000] [--words 20000]
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import taxonomy
+from taxonomy import tokenize
+
+FILLER = ('we are looking for an engineer with experience in building and maintaining '
+          'digital products across teams and stakeholders').split()
+
+
+def substring_extract(categories, text):
+    # The original extract_skills loop, kept here as the baseline
+    text_lower = text.lower()
+    found_skills = {category: [] for category in categories}
+    for category, skills in categories.items():
+        for skill in skills:
+            if skill in text_lower:
+                found_skills[category].append(skill)
+    return found_skills
+
+
+def reference_present(canonical, text):
+    # Exact token-sequence matching done the slow, obvious way: every n-gram of the text in a set
+    tokens = tokenize(text)
+    patterns = {s: s for skills in canonical['categories'].values() for s in skills}
+    patterns.update(canonical['aliases'])
+    longest = max(len(tokenize(p)) for p in patterns)
+    ngrams = {' '.join(tokens[i:i + n]) for n in range(1, longest + 1) for i in range(len(tokens) - n + 1)}
+    return {skill for pattern, skill in patterns.items() if ' '.join(tokenize(pattern)) in ngrams}
+
+
+def synthetic_taxonomy(base, size, rng):
+    letters = 'abcdefghijklmnopqrstuvwxyz'
+    skills = set(base['categories']['technical'])
+    while len(skills) < size:
+        words = [''.join(rng.choice(letters) for _ in range(rng.randint(3, 9))) for _ in range(rng.randint(1, 3))]
+        skills.add(' '.join(words))
+    return {'categories': {'technical': sorted(skills), 'soft': list(base['categories']['soft'])},
+            'aliases': dict(base['aliases']), 'weights': dict(base['weights'])}
+
+
+def synthetic_text(canonical, words, rng):
+    skills = [s for group in canonical['categories'].values() for s in group] + list(canonical['aliases'])
+    out = []
+    while len(out) < words:
+        if rng.random() < 0.05:
+            out.append(rng.choice(skills))
+        else:
+            out.append(rng.choice(FILLER))
+    return ' '.join(out)
+
+
+def best_of(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run(name, canonical, text, repeat, work_dir):
+    path = os.path.join(work_dir, f"{name}.sktx")
+    start = time.perf_counter()
+    taxonomy.compile_taxonomy(canonical, path)
+    build = time.perf_counter() - start
+    tracemalloc.start()
+    start = time.perf_counter()
+    compiled = taxonomy.CompiledTaxonomy(path)
+    load = time.perf_counter() - start
+    private, _peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    expected = reference_present(canonical, text)
+    got = compiled.present(text)
+    if got != expected:
+        sys.exit(f"{name}: compiled taxonomy differs from the n-gram reference: "
+                 f"missing {sorted(expected - got)[:5]}, extra {sorted(got - expected)[:5]}")
+
+    legacy = best_of(lambda: substring_extract(canonical['categories'], text), repeat)
+    matched = best_of(lambda: compiled.extract(text), repeat)
+    keywords = sum(len(v) for v in canonical['categories'].values())
+    print(f"{name:<10} keywords={keywords:<6} chars={len(text):<8} compile={build * 1000:7.1f}ms "
+          f"load={load * 1000:6.1f}ms mapped={os.path.getsize(path) / 1024:7.0f}KB "
+          f"per-process={private / 1024:7.0f}KB parity=ok({len(got)} skills)")
+    print(f"{'':<10} substring={legacy * 1000:8.2f}ms compiled={matched * 1000:8.2f}ms "
+          f"speedup={legacy / matched:7.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--skills', type=int, default=10000)
+    parser.add_argument('--words', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    with open(taxonomy.TAXONOMY_PATH, 'rb') as f:
+        bundled = taxonomy.parse_source(f.read())
+    synthetic = taxonomy.parse_source(json.dumps(synthetic_taxonomy(bundled, args.skills, rng)))
+    with tempfile.TemporaryDirectory() as work_dir:
+        run('bundled', bundled, synthetic_text(bundled, args.words, rng), args.repeat, work_dir)
+        run('synthetic', synthetic, synthetic_text(synthetic, args.words, rng), args.repeat, work_dir)
+
+
+if __name__ == '__main__':
+    main()
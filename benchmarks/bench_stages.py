@@ -0,0 +1,198 @@
+# Per-stage benchmarks on a reproducible synthetic corpus, with a regression check.
+#
+#   python benchmarks/bench_stages.py [--repeat 5] [--out results.json]
+#   python benchmarks/bench_stages.py --update-baseline
+#
+# Generates resumes and job descriptions of 1 to 200 pages at low and high skill
+# density (same seed, same bytes), then times each stage on its own:
+# extract_text_from_pdf, extract_skills, compute_job_weights, make_pie_chart and
+# the ReportLab build behind /download_pdf. Times are the median of --repeat
+# runs; memory is the tracemalloc peak of one extra run, measured separately so
+# tracing does not skew the times. Results are compared against the baseline
+# file and the script exits non-zero if any stage got slower or bigger than the
+# tolerance allows. Baselines are machine specific, so record one locally with
+# --update-baseline before relying on the check.
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+
+from analysis import (compute_job_weights, current_taxonomy, extract_skills, extract_text_from_pdf, run_analysis,
+                      taxonomy_version)
+
+CORPUS_VERSION = 1
+DEFAULT_CORPUS_DIR = os.path.join(REPO, 'cache', 'bench_corpus')
+DEFAULT_BASELINE = os.path.join(REPO, 'cache', 'bench_stages_baseline.json')
+PAGE_COUNTS = [1, 5, 20, 50, 200]
+# Chance that a line mentions a skill
+DENSITIES = {'sparse': 0.02, 'dense': 0.5}
+LINES_PER_PAGE = 45
+FILLER = ('responsible for delivering quarterly results across several teams while maintaining '
+          'documentation reviewing designs supporting customers and improving internal processes').split()
+
+
+def corpus_name(kind, pages, density):
+    return f"{kind}_{pages:03d}p_{density}.pdf"
+
+
+def write_pdf(path, rng, pages, density):
+    from reportlab.pdfgen import canvas
+    skills = current_taxonomy().skills
+    # invariant=1 drops the timestamp and random document id, so reruns are byte identical
+    c = canvas.Canvas(path, invariant=1)
+    for _ in range(pages):
+        y = 800
+        for _ in range(LINES_PER_PAGE):
+            words = rng.sample(FILLER, 8)
+            if rng.random() < DENSITIES[density]:
+                words.insert(rng.randrange(len(words)), rng.choice(skills).title())
+            c.drawString(40, y, ' '.join(words))
+            y -= 17
+        c.showPage()
+    c.save()
+
+
+def build_corpus(corpus_dir, seed):
+    # Rebuilt only when the seed, generator version or taxonomy (whose skills are written in) changes
+    manifest_path = os.path.join(corpus_dir, 'manifest.json')
+    manifest = {'version': CORPUS_VERSION, 'seed': seed, 'taxonomy_version': taxonomy_version()}
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            if json.load(f) == manifest:
+                return
+    os.makedirs(corpus_dir, exist_ok=True)
+    for kind in ('resume', 'jobdesc'):
+        for pages in PAGE_COUNTS:
+            for density in DENSITIES:
+                rng = random.Random(f"{seed}:{kind}:{pages}:{density}")
+                write_pdf(os.path.join(corpus_dir, corpus_name(kind, pages, density)), rng, pages, density)
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f)
+
+
+def measure(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        value = fn()
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    fn()
+    _current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return value, {'median_ms': statistics.median(times) * 1000, 'min_ms': min(times) * 1000,
+                   'peak_kb': peak / 1024}
+
+
+def run_stages(corpus_dir, repeat):
+    import report
+    results = {}
+    for pages in PAGE_COUNTS:
+        for density in DENSITIES:
+            case = f"{pages:03d}p_{density}"
+            resume_path = os.path.join(corpus_dir, corpus_name('resume', pages, density))
+            jobdesc_path = os.path.join(corpus_dir, corpus_name('jobdesc', pages, density))
+
+            (text, _extract_stats), stats = measure(lambda: extract_text_from_pdf(resume_path), repeat)
+            results[f"extract_text/{case}"] = dict(stats, pages=pages, chars=len(text))
+
+            found, stats = measure(lambda: extract_skills(text), repeat)
+            resume_skills = set().union(*found.values())
+            results[f"extract_skills/{case}"] = dict(stats, chars=len(text), skills=len(resume_skills))
+
+            # The same dict download_pdf gets; not timed, it only feeds the later stages
+            data = dict(run_analysis(resume_path, jobdesc_path), user_name='Bench Candidate',
+                        user_email='bench@example.com')
+            required = data['required_skills']
+            _weights, stats = measure(lambda: compute_job_weights(required), repeat)
+            results[f"compute_job_weights/{case}"] = dict(stats, skills=len(required))
+
+            def pie_chart():
+                report.pie_charts.clear()
+                return report.make_pie_chart(data['required_skills'], data['weights'], data['status_map'])
+            _drawing, stats = measure(pie_chart, repeat)
+            results[f"make_pie_chart/{case}"] = dict(stats, skills=len(required))
+
+            def build_report():
+                report.pie_charts.clear()
+                return report.build_report_pdf(data, 'January 01, 2025')
+            pdf, stats = measure(build_report, repeat)
+            results[f"build_report_pdf/{case}"] = dict(stats, bytes=len(pdf))
+    return results
+
+
+def compare(results, baseline, tolerance, slack_ms, slack_kb):
+    # A stage regresses when it is both tolerance (relative) and slack (absolute) worse
+    failures = []
+    for name, result in sorted(results.items()):
+        before = baseline.get(name)
+        if before is None:
+            continue
+        limit_ms = max(before['median_ms'] * (1 + tolerance), before['median_ms'] + slack_ms)
+        if result['median_ms'] > limit_ms:
+            failures.append(f"{name}: {result['median_ms']:.2f}ms vs baseline {before['median_ms']:.2f}ms")
+        limit_kb = max(before['peak_kb'] * (1 + tolerance), before['peak_kb'] + slack_kb)
+        if result['peak_kb'] > limit_kb:
+            failures.append(f"{name}: peak {result['peak_kb']:.0f}KB vs baseline {before['peak_kb']:.0f}KB")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=2025)
+    parser.add_argument('--corpus-dir', default=DEFAULT_CORPUS_DIR)
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--out', help="also write this run's results to a JSON file")
+    parser.add_argument('--update-baseline', action='store_true')
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    parser.add_argument('--slack-ms', type=float, default=1.0)
+    parser.add_argument('--slack-kb', type=float, default=64.0)
+    args = parser.parse_args()
+
+    build_corpus(args.corpus_dir, args.seed)
+    results = run_stages(args.corpus_dir, args.repeat)
+    run = {'meta': {'python': platform.python_version(), 'machine': platform.machine(), 'seed': args.seed,
+                    'corpus_version': CORPUS_VERSION, 'taxonomy_version': taxonomy_version(),
+                    'repeat': args.repeat},
+           'results': results}
+
+    print(f"{'stage':<36} {'median ms':>10} {'min ms':>9} {'peak KB':>9}")
+    for name, result in sorted(results.items()):
+        print(f"{name:<36} {result['median_ms']:10.2f} {result['min_ms']:9.2f} {result['peak_kb']:9.0f}")
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(run, f, indent=2, sort_keys=True)
+
+    if args.update_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(run, f, indent=2, sort_keys=True)
+        print(f"\nbaseline written to {args.baseline}")
+        return
+    if not os.path.exists(args.baseline):
+        print(f"\nno baseline at {args.baseline}; run with --update-baseline to record one")
+        return
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    corpus = (args.seed, CORPUS_VERSION, run['meta']['taxonomy_version'])
+    if tuple(baseline['meta'].get(k) for k in ('seed', 'corpus_version', 'taxonomy_version')) != corpus:
+        sys.exit("baseline was recorded on a different corpus or taxonomy; rerun with --update-baseline")
+    failures = compare(results, baseline['results'], args.tolerance, args.slack_ms, args.slack_kb)
+    for failure in failures:
+        print("FAIL:", failure)
+    if not failures:
+        print(f"\nno regressions against {args.baseline}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,368 @@
+# End-to-end load test of the browser flow, for tuning worker counts and
+# catching scaling regressions before they reach production.
+#
+#   python benchmarks/load_test.py [--concurrency 1,2,4,8] [--duration 20]
+#                                  [--server-cmd "gunicorn -w 4 -b 127.0.0.1:{port} app:app"]
+#                                  [--url http://host:port --server-pid PID] [--out load.json]
+#
+# Every virtual user keeps its own cookie session and repeats what a browser
+# does: POST / with a resume and a job description, GET /preview, GET /analyze
+# (polling /jobs/<id> while the wait page is shown, like its script does) and
+# POST /download_pdf. Each concurrency level runs for --duration seconds and
+# reports flows per second, p50/p95/p99 latency and errors per route, and the
+# peak resident memory of the server and all its worker processes.
+#
+# Without --url a server is started on a free local port (by default Flask's
+# threaded development server) in a scratch directory, so caches, uploads and
+# sessions start empty. Resumes get a unique trailer per flow so the
+# content-addressed caches see new documents, as in production; pass
+# --reuse-uploads to measure the fully cached path instead. The load generator
+# shares the machine with the server, so compare runs on the same host only.
+
+import argparse
+import http.client
+import json
+import os
+import re
+import shlex
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+import uuid
+from http.cookies import SimpleCookie
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+
+from bench_stages import DEFAULT_CORPUS_DIR, build_corpus, corpus_name
+
+DEFAULT_SERVER_CMD = f"{shlex.quote(sys.executable)} -c \"import app; app.app.run(host='127.0.0.1', port={{port}}, threaded=True)\""
+ROUTES = ['POST /', 'GET /preview', 'GET /analyze', 'GET /jobs/<id>', 'POST /download_pdf', 'flow']
+# The wait page links to its job; the result page never does
+WAIT_JOB = re.compile(rb'/jobs/([0-9a-f]+)/cancel')
+POLL_INTERVAL = 0.1
+RSS_INTERVAL = 0.5
+PERCENTILES = (50, 95, 99)
+
+
+class FlowError(Exception):
+    pass
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def process_tree_rss(pid):
+    # Resident memory in bytes of pid and all of its descendants (Linux /proc)
+    children = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+    total = 0
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        pending.extend(children.get(current, []))
+        try:
+            with open(f'/proc/{current}/status') as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        total += int(line.split()[1]) * 1024
+        except OSError:
+            pass
+    return total
+
+
+class RssSampler(threading.Thread):
+    def __init__(self, pid):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.peak = 0
+        self.last = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            self.last = process_tree_rss(self.pid)
+            self.peak = max(self.peak, self.last)
+            self._stop_event.wait(RSS_INTERVAL)
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+        return self.peak, self.last
+
+
+def multipart(fields, files):
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    for name, (filename, data) in files.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+                     f'Content-Type: application/pdf\r\n\r\n'.encode() + data + b'\r\n')
+    parts.append(f'--{boundary}--\r\n'.encode())
+    return b''.join(parts), f'multipart/form-data; boundary={boundary}'
+
+
+class Client:
+    # One browser: a keep-alive connection and a cookie jar, recording every request it makes
+
+    def __init__(self, host, port, record):
+        self.conn = http.client.HTTPConnection(host, port, timeout=120)
+        self.cookies = {}
+        self.record = record
+
+    def request(self, method, path, route, body=None, headers=None, expect=(200,)):
+        headers = dict(headers or {})
+        if self.cookies:
+            headers['Cookie'] = '; '.join(f'{k}={v}' for k, v in self.cookies.items())
+        start = time.perf_counter()
+        try:
+            self.conn.request(method, path, body=body, headers=headers)
+            response = self.conn.getresponse()
+            data = response.read()
+        except (OSError, http.client.HTTPException) as e:
+            self.conn.close()
+            self.record(route, time.perf_counter() - start, type(e).__name__)
+            raise FlowError(f"{route}: {e}")
+        elapsed = time.perf_counter() - start
+        for header in response.headers.get_all('Set-Cookie') or []:
+            for name, morsel in SimpleCookie(header).items():
+                self.cookies[name] = morsel.value
+        error = None if response.status in expect else str(response.status)
+        self.record(route, elapsed, error)
+        if error:
+            raise FlowError(f"{route}: HTTP {response.status}")
+        return response, data
+
+    def close(self):
+        self.conn.close()
+
+
+def run_flow(client, resume, jobdesc, unique):
+    if unique:
+        # Bytes after %%EOF are ignored by PDF readers but change the content hash
+        resume = resume + f'\n% load-test {uuid.uuid4().hex}\n'.encode()
+    body, content_type = multipart({'action': 'preview', 'name': 'Load Test', 'email': 'load@example.com'},
+                                   {'resume': ('resume.pdf', resume), 'jobdesc': ('jobdesc.pdf', jobdesc)})
+    client.request('POST', '/', 'POST /', body=body, headers={'Content-Type': content_type}, expect=(302,))
+    client.request('GET', '/preview', 'GET /preview')
+    while True:
+        _response, page = client.request('GET', '/analyze', 'GET /analyze')
+        match = WAIT_JOB.search(page)
+        if match is None:
+            break
+        job_id = match.group(1).decode()
+        while True:
+            _response, status = client.request('GET', f'/jobs/{job_id}', 'GET /jobs/<id>')
+            state = json.loads(status)['status']
+            if state not in ('queued', 'running'):
+                break
+            time.sleep(POLL_INTERVAL)
+        if state != 'done':
+            raise FlowError(f"analysis job ended {state}")
+    _response, pdf = client.request('POST', '/download_pdf', 'POST /download_pdf',
+                                    body=b'', headers={'Content-Type': 'application/x-www-form-urlencoded'})
+    if not pdf.startswith(b'%PDF'):
+        raise FlowError("download_pdf did not return a PDF")
+
+
+def percentile(ordered, p):
+    # Nearest-rank percentile of an already sorted list
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, max(0, -(-len(ordered) * p // 100) - 1))]
+
+
+def run_level(host, port, concurrency, duration, resume, jobdesc, unique, server_pid):
+    lock = threading.Lock()
+    timings = {route: [] for route in ROUTES}
+    errors = {route: {} for route in ROUTES}
+
+    def record(route, seconds, error):
+        with lock:
+            if error:
+                errors[route][error] = errors[route].get(error, 0) + 1
+            else:
+                timings[route].append(seconds)
+
+    deadline = time.perf_counter() + duration
+
+    def user():
+        client = Client(host, port, record)
+        try:
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                try:
+                    run_flow(client, resume, jobdesc, unique)
+                except FlowError as e:
+                    record('flow', time.perf_counter() - start, str(e).split(':')[0])
+                    # A fresh session, as a user would start over after an error page
+                    client.close()
+                    client = Client(host, port, record)
+                else:
+                    record('flow', time.perf_counter() - start, None)
+        finally:
+            client.close()
+
+    sampler = RssSampler(server_pid) if server_pid else None
+    if sampler:
+        sampler.start()
+    start = time.perf_counter()
+    users = [threading.Thread(target=user) for _ in range(concurrency)]
+    for t in users:
+        t.start()
+    for t in users:
+        t.join()
+    elapsed = time.perf_counter() - start
+    peak_rss, end_rss = sampler.stop() if sampler else (None, None)
+
+    routes = {}
+    for route in ROUTES:
+        ordered = sorted(timings[route])
+        failed = sum(errors[route].values())
+        total = len(ordered) + failed
+        routes[route] = {'count': total, 'errors': failed, 'error_kinds': errors[route],
+                         'error_rate': failed / total if total else 0.0}
+        for p in PERCENTILES:
+            value = percentile(ordered, p)
+            routes[route][f'p{p}_ms'] = None if value is None else value * 1000
+    flows = routes['flow']
+    return {'concurrency': concurrency, 'seconds': elapsed,
+            'flows_per_second': (flows['count'] - flows['errors']) / elapsed,
+            'requests_per_second': sum(r['count'] for name, r in routes.items() if name != 'flow') / elapsed,
+            'peak_rss_bytes': peak_rss, 'end_rss_bytes': end_rss, 'routes': routes}
+
+
+def start_server(command, port, workdir):
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [REPO, os.environ.get('PYTHONPATH')])))
+    log = open(os.path.join(workdir, 'server.log'), 'wb')
+    proc = subprocess.Popen(shlex.split(command.format(port=port)), cwd=workdir, env=env,
+                            stdout=log, stderr=subprocess.STDOUT)
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            sys.exit(f"server exited with {proc.returncode}; see {log.name}")
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=2)
+            conn.request('GET', '/')
+            conn.getresponse().read()
+            conn.close()
+            return proc
+        except OSError:
+            time.sleep(0.2)
+    proc.kill()
+    sys.exit(f"server did not answer on port {port} within 60s; see {log.name}")
+
+
+def stop_server(proc):
+    proc.terminate()
+    try:
+        proc.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
+
+
+def format_ms(value):
+    return f"{value:9.1f}" if value is not None else f"{'-':>9}"
+
+
+def print_level(result):
+    rss = result['peak_rss_bytes']
+    rss_text = f", server RSS peak {rss / 2 ** 20:.0f} MB" if rss else ''
+    print(f"\nconcurrency {result['concurrency']}: {result['flows_per_second']:.2f} flows/s, "
+          f"{result['requests_per_second']:.1f} requests/s{rss_text}")
+    print(f"  {'route':<20} {'count':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>8}")
+    for route, stats in result['routes'].items():
+        if not stats['count']:
+            continue
+        kinds = ', '.join(f"{kind} x{n}" for kind, n in sorted(stats['error_kinds'].items()))
+        print(f"  {route:<20} {stats['count']:7d} {format_ms(stats['p50_ms'])} {format_ms(stats['p95_ms'])} "
+              f"{format_ms(stats['p99_ms'])} {stats['errors']:8d}{'  ' + kinds if kinds else ''}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Drive the upload -> analyze -> download flow at rising concurrency")
+    parser.add_argument('--concurrency', default='1,2,4,8', help="comma-separated numbers of simultaneous users")
+    parser.add_argument('--duration', type=float, default=20.0, help="seconds per concurrency level")
+    parser.add_argument('--url', help="test an already running server instead of starting one")
+    parser.add_argument('--server-pid', type=int, help="with --url, the server's master pid for RSS sampling")
+    parser.add_argument('--server-cmd', default=DEFAULT_SERVER_CMD,
+                        help="command that serves app:app on {port}, run from a scratch directory")
+    parser.add_argument('--resume', help="resume PDF to upload (default: a synthetic 5-page resume)")
+    parser.add_argument('--jobdesc', help="job description PDF to upload (default: a synthetic 1-page one)")
+    parser.add_argument('--reuse-uploads', action='store_true', help="send identical files every flow")
+    parser.add_argument('--seed', type=int, default=2025, help="seed of the synthetic corpus")
+    parser.add_argument('--out', help="also write the results to a JSON file")
+    parser.add_argument('--max-error-rate', type=float,
+                        help="exit non-zero if any level's flow error rate is above this fraction")
+    args = parser.parse_args()
+    levels = [int(n) for n in args.concurrency.split(',') if n.strip()]
+
+    if not (args.resume and args.jobdesc):
+        build_corpus(DEFAULT_CORPUS_DIR, args.seed)
+    with open(args.resume or os.path.join(DEFAULT_CORPUS_DIR, corpus_name('resume', 5, 'dense')), 'rb') as f:
+        resume = f.read()
+    with open(args.jobdesc or os.path.join(DEFAULT_CORPUS_DIR, corpus_name('jobdesc', 1, 'dense')), 'rb') as f:
+        jobdesc = f.read()
+
+    proc = None
+    workdir = tempfile.TemporaryDirectory(prefix='skillgap-load-')
+    if args.url:
+        parsed = urllib.parse.urlsplit(args.url)
+        host, port, server_pid = parsed.hostname, parsed.port or 80, args.server_pid
+    else:
+        host, port = '127.0.0.1', free_port()
+        proc = start_server(args.server_cmd, port, workdir.name)
+        server_pid = proc.pid
+    print(f"target http://{host}:{port}, {args.duration:g}s per level, "
+          f"{'identical' if args.reuse_uploads else 'unique'} uploads")
+
+    results = []
+    try:
+        for concurrency in levels:
+            result = run_level(host, port, concurrency, args.duration, resume, jobdesc,
+                               not args.reuse_uploads, server_pid)
+            print_level(result)
+            results.append(result)
+    except KeyboardInterrupt:
+        print("\ninterrupted", file=sys.stderr)
+    finally:
+        if proc is not None:
+            stop_server(proc)
+        workdir.cleanup()
+
+    if len(results) > 1:
+        print(f"\n{'users':>6} {'flows/s':>9} {'flow p95 ms':>12} {'errors':>7} {'peak RSS MB':>12}")
+        for result in results:
+            flow = result['routes']['flow']
+            rss = result['peak_rss_bytes']
+            print(f"{result['concurrency']:6d} {result['flows_per_second']:9.2f} {format_ms(flow['p95_ms']):>12} "
+                  f"{flow['errors']:7d} {rss / 2 ** 20 if rss else 0:12.0f}")
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump({'duration': args.duration, 'unique_uploads': not args.reuse_uploads, 'levels': results},
+                      f, indent=2)
+    if args.max_error_rate is not None:
+        worst = max((r['routes']['flow']['error_rate'] for r in results), default=0.0)
+        if worst > args.max_error_rate:
+            sys.exit(f"flow error rate {worst:.1%} is above {args.max_error_rate:.1%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,253 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+
+_OPERATOR = re.compile(r'\s*\b(AND|OR|NOT)\b\s*')
+
+# Bit positions set in each byte value, for turning a bitmap back into ids
+_BYTE_BITS = [tuple(i for i in range(8) if b >> i & 1) for b in range(256)]
+
+
+def encode_bitmap(bits):
+    return zlib.compress(bits.to_bytes((bits.bit_length() + 7) // 8, 'little'))
+
+
+def decode_bitmap(blob):
+    return int.from_bytes(zlib.decompress(blob), 'little') if blob else 0
+
+
+def bitmap_ids(bits, limit=None):
+    # Set bit positions in ascending order, stopping once limit have been found
+    data = bits.to_bytes((bits.bit_length() + 7) // 8, 'little')
+    ids = []
+    for offset, byte in enumerate(data):
+        if byte:
+            base = offset * 8
+            ids.extend(base + i for i in _BYTE_BITS[byte])
+            if limit is not None and len(ids) >= limit:
+                return ids[:limit]
+    return ids
+
+
+class CandidateIndex:
+    # Persistent inverted index of analyzed candidates: skill -> bitmap of
+    # candidate ids, stored zlib-compressed in SQLite and updated in place as
+    # each analysis arrives. Queries run against an in-memory copy of the
+    # bitmaps (Python ints, so AND/OR/NOT are single big-integer operations).
+    # Every write stamps the candidate with the next seq, so when another
+    # process has written (PRAGMA data_version moved) only the candidates past
+    # the last seq seen are read back and their bits flipped; the whole index
+    # is loaded just once per process. data_version only means something when
+    # compared on one connection, so each process uses a single connection,
+    # under _lock.
+
+    def __init__(self, path):
+        self.path = path
+        self._conn = None
+        self._conn_pid = None
+        self._lock = threading.Lock()
+        self._loaded_version = None
+        self._loaded_seq = None
+        self._postings = {}
+        self._skills = {}
+        self._universe = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            conn = self._connect()
+            conn.execute("CREATE TABLE IF NOT EXISTS candidates ("
+                         "id INTEGER PRIMARY KEY, key TEXT UNIQUE NOT NULL, name TEXT, email TEXT, "
+                         "source TEXT, skills TEXT NOT NULL, updated REAL NOT NULL, seq INTEGER NOT NULL DEFAULT 0)")
+            if 'seq' not in {row[1] for row in conn.execute("PRAGMA table_info(candidates)")}:
+                # Written before seq existed; those rows are covered by the first full load
+                conn.execute("ALTER TABLE candidates ADD COLUMN seq INTEGER NOT NULL DEFAULT 0")
+            conn.execute("CREATE INDEX IF NOT EXISTS candidates_seq ON candidates (seq)")
+            conn.execute("CREATE TABLE IF NOT EXISTS postings (skill TEXT PRIMARY KEY, bitmap BLOB NOT NULL)")
+
+    def _connect(self):
+        # Call with _lock held
+        if self._conn is None or self._conn_pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn, self._conn_pid = conn, os.getpid()
+            # A forked child inherits the parent's in-memory copy but not its connection
+            self._loaded_version = None
+            self._loaded_seq = None
+        return self._conn
+
+    def add(self, key, skills, name='', email='', source=''):
+        # Adds or updates one candidate (key is typically the resume's sha256)
+        # and flips only the posting bits that changed. Returns the candidate id.
+        skills = sorted(set(skills))
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute("SELECT id, skills FROM candidates WHERE key = ?", (key,)).fetchone()
+                old_skills = set(json.loads(row[1])) if row else set()
+                seq = conn.execute("SELECT COALESCE(MAX(seq), 0) + 1 FROM candidates").fetchone()[0]
+                conn.execute(
+                    "INSERT INTO candidates (key, name, email, source, skills, updated, seq) VALUES (?, ?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET name = excluded.name, email = excluded.email, "
+                    "source = excluded.source, skills = excluded.skills, updated = excluded.updated, seq = excluded.seq",
+                    (key, name, email, source, json.dumps(skills), time.time(), seq))
+                candidate_id = row[0] if row else conn.execute(
+                    "SELECT id FROM candidates WHERE key = ?", (key,)).fetchone()[0]
+                bit = 1 << candidate_id
+                for skill in set(skills) ^ old_skills:
+                    found = conn.execute("SELECT bitmap FROM postings WHERE skill = ?", (skill,)).fetchone()
+                    bits = decode_bitmap(found[0]) if found else 0
+                    bits = bits | bit if skill in skills else bits & ~bit
+                    conn.execute("INSERT OR REPLACE INTO postings (skill, bitmap) VALUES (?, ?)",
+                                 (skill, encode_bitmap(bits)))
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            # Commits on this connection do not bump its data_version, so keep the in-memory copy current by hand
+            if self._loaded_version is not None:
+                self._remember(candidate_id, frozenset(skills), key, name, email, source)
+                if seq == self._loaded_seq + 1:
+                    # Nobody else wrote in between, so the next refresh need not read this one back
+                    self._loaded_seq = seq
+        return candidate_id
+
+    def _refresh(self):
+        # Call with _lock held
+        conn = self._connect()
+        version = conn.execute("PRAGMA data_version").fetchone()[0]
+        if version == self._loaded_version:
+            return
+        # One read transaction, so postings and candidates come from the same snapshot
+        conn.execute("BEGIN")
+        try:
+            if self._loaded_seq is None:
+                self._load(conn)
+            else:
+                self._apply_changes(conn)
+        finally:
+            conn.execute("COMMIT")
+        self._loaded_version = version
+
+    def _load(self, conn):
+        postings = {skill: decode_bitmap(blob) for skill, blob in conn.execute("SELECT skill, bitmap FROM postings")}
+        skills = {}
+        universe = 0
+        last_seq = 0
+        for candidate_id, key, name, email, source, skill_json, seq in conn.execute(
+                "SELECT id, key, name, email, source, skills, seq FROM candidates"):
+            skills[candidate_id] = (frozenset(json.loads(skill_json)), key, name, email, source)
+            universe |= 1 << candidate_id
+            last_seq = max(last_seq, seq)
+        self._postings, self._skills, self._universe = postings, skills, universe
+        self._loaded_seq = last_seq
+
+    def _apply_changes(self, conn):
+        # Flips the bits of candidates written since the last seq seen, without reading postings back
+        for candidate_id, key, name, email, source, skill_json, seq in conn.execute(
+                "SELECT id, key, name, email, source, skills, seq FROM candidates WHERE seq > ? ORDER BY seq",
+                (self._loaded_seq,)):
+            self._remember(candidate_id, frozenset(json.loads(skill_json)), key, name, email, source)
+            self._loaded_seq = seq
+
+    def _remember(self, candidate_id, skills, key, name, email, source):
+        # Flips the candidate's in-memory bits from the skills held for it in memory,
+        # which other processes' writes may have changed in the database meanwhile
+        old = self._skills.get(candidate_id)
+        bit = 1 << candidate_id
+        for skill in skills ^ (old[0] if old else frozenset()):
+            bits = self._postings.get(skill, 0)
+            self._postings[skill] = bits | bit if skill in skills else bits & ~bit
+        self._skills[candidate_id] = (skills, key, name, email, source)
+        self._universe |= bit
+
+    def query(self, all_of=(), any_of=(), none_of=(), rank=None, limit=50):
+        # Boolean skill query. Matches are ranked by the summed weight of the
+        # rank skills they have (rank maps skill -> weight), then by id.
+        start = time.perf_counter()
+        with self._lock:
+            self._refresh()
+            bits = self._universe
+            for skill in all_of:
+                bits &= self._postings.get(skill, 0)
+            if any_of:
+                either = 0
+                for skill in any_of:
+                    either |= self._postings.get(skill, 0)
+                bits &= either
+            for skill in none_of:
+                bits &= ~self._postings.get(skill, 0)
+            results = []
+            for score, candidate_id in self._top(bits, rank or {}, limit):
+                skills, key, name, email, source = self._skills[candidate_id]
+                results.append({'id': candidate_id, 'key': key, 'name': name, 'email': email,
+                                'source': source, 'skills': sorted(skills), 'score': round(score, 1)})
+        return {'total': bits.bit_count(), 'results': results,
+                'took_ms': round((time.perf_counter() - start) * 1000, 2)}
+
+    def _top(self, bits, rank, limit):
+        # Splits the matches into groups by the rank skills they have, one
+        # big-integer AND per group and skill, so scoring never loops over
+        # candidates; ids are then read only from the best groups until limit
+        # is filled. Weights are added in rank order, as a per-candidate sum would.
+        groups = {0: bits}
+        for skill, weight in rank.items():
+            posting = self._postings.get(skill, 0)
+            if not posting or not weight:
+                continue
+            split = {}
+            for score, group in groups.items():
+                for part, part_score in ((group & posting, score + weight), (group & ~posting, score)):
+                    if part:
+                        split[part_score] = split.get(part_score, 0) | part
+            groups = split
+        top = []
+        for score in sorted(groups, reverse=True):
+            top.extend((score, candidate_id) for candidate_id in bitmap_ids(groups[score], limit - len(top)))
+            if len(top) >= limit:
+                break
+        return top
+
+    def snapshot(self):
+        with self._lock:
+            conn = self._connect()
+            candidates = conn.execute("SELECT COUNT(*) FROM candidates").fetchone()[0]
+            skills, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(bitmap)), 0) FROM postings").fetchone()
+        return {'candidates': candidates, 'skills': skills, 'posting_bytes': size}
+
+
+def parse_query(q):
+    # 'python AND sql NOT cloud' -> (all_of, any_of, none_of). Terms joined by OR
+    # form one any-of group; operators must be upper case since skills may contain spaces.
+    all_of, any_of, none_of = [], [], []
+    op = 'AND'
+    for part in _OPERATOR.split(q or ''):
+        if part in ('AND', 'OR', 'NOT'):
+            op = part
+            continue
+        term = part.strip().lower()
+        if not term:
+            continue
+        if op == 'NOT':
+            none_of.append(term)
+        elif op == 'OR':
+            if all_of and not any_of:
+                any_of.append(all_of.pop())
+            any_of.append(term)
+        else:
+            all_of.append(term)
+    return all_of, any_of, none_of
+
+
+def index_results(index, results, source):
+    # Passes screening results through unchanged, indexing each successful one on the way
+    for result in results:
+        if not result.get('error') and result.get('resume_sha256'):
+            index.add(result['resume_sha256'], result.get('resume_skills', []), name=result['candidate'], source=source)
+        yield result
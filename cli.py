@@ -0,0 +1,209 @@
+# Offline batch analysis without Flask.
+#
+#   python cli.py RESUMES... [--jobdesc JD.pdf] [--out results.jsonl] [--workers N]
+#
+# RESUMES are PDF files, directories (searched recursively) or glob patterns.
+# Results are written as they finish; the output file doubles as the checkpoint,
+# so rerunning the same command after a crash or Ctrl-C skips every resume that
+# is already in it. The format follows the extension: .jsonl, .csv or .parquet
+# (Parquet needs pyarrow and is converted from a JSON Lines file at the end).
+
+import argparse
+import csv
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+import similarity
+from analysis import score_candidate, skill_set
+from pdf_extract import extract_text
+from screening import iter_bounded, prepare_job
+
+FIELDS = ['path', 'pages', 'chars', 'skills', 'suitability', 'similarity', 'matched_count', 'lacking_count', 'total_skills',
+          'matching_skills', 'lacking_skills', 'extract_seconds', 'match_seconds', 'score_seconds', 'error']
+LIST_FIELDS = ('skills', 'matching_skills', 'lacking_skills')
+STAGES = ('extract', 'match', 'score')
+
+
+def find_pdfs(inputs):
+    paths = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, _dirs, files in os.walk(item):
+                paths.update(os.path.join(root, f) for f in files if f.lower().endswith('.pdf'))
+        elif os.path.isfile(item):
+            paths.add(item)
+        else:
+            paths.update(p for p in glob.glob(item, recursive=True) if p.lower().endswith('.pdf'))
+    return sorted(paths)
+
+
+def analyze_file(path, required_skills, weights, page_workers=1, jobdesc_vector=None):
+    # Runs in a worker process; each stage is timed separately for the summary
+    result = {'path': path, 'error': None}
+    try:
+        start = time.perf_counter()
+        # Straight from the PDF: a batch reads each file once, so the text cache would only fill up
+        text, stats = extract_text(path, workers=page_workers)
+        result['extract_seconds'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        resume_all = skill_set(text)
+        result['match_seconds'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        if required_skills is not None:
+            result.update(score_candidate(resume_all, required_skills, weights))
+        if jobdesc_vector is not None:
+            model = similarity.current()
+            result['similarity'] = round(model.cosine(model.vector(text), jobdesc_vector) * 100, 1)
+        result['score_seconds'] = time.perf_counter() - start
+        result.update({'pages': stats['pages_read'], 'chars': len(text), 'skills': sorted(resume_all)})
+        if stats['image_only']:
+            result['error'] = 'No text layer (image-only PDF)'
+    except Exception as e:
+        result['error'] = ' '.join(str(e).split()) or type(e).__name__
+    return result
+
+
+def iter_results(paths, required_skills, weights, workers, page_workers, jobdesc_vector=None):
+    if page_workers > 1:
+        # Page-parallel extraction runs its own pool, which must not be nested in a document pool
+        for path in paths:
+            yield analyze_file(path, required_skills, weights, page_workers, jobdesc_vector)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        items = ((path, required_skills, weights, 1, jobdesc_vector) for path in paths)
+        for _item, result in iter_bounded(pool, analyze_file, items, workers * 4):
+            yield result
+
+
+def _drop_partial_line(path):
+    # A killed run can leave half a line at the end; cut back to the last complete one
+    with open(path, 'rb+') as f:
+        data = f.read()
+        end = data.rfind(b'\n') + 1
+        if end != len(data):
+            f.truncate(end)
+
+
+def completed_paths(path, fmt):
+    if not os.path.exists(path):
+        return set()
+    _drop_partial_line(path)
+    with open(path, newline='') as f:
+        if fmt == 'csv':
+            return {row['path'] for row in csv.DictReader(f)}
+        return {json.loads(line)['path'] for line in f if line.strip()}
+
+
+class ResultWriter:
+    def __init__(self, path, fmt):
+        self.fmt = fmt
+        new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self.file = open(path, 'a', newline='')
+        if fmt == 'csv':
+            self.writer = csv.DictWriter(self.file, fieldnames=FIELDS, extrasaction='ignore')
+            if new:
+                self.writer.writeheader()
+
+    def write(self, result):
+        if self.fmt == 'csv':
+            row = dict(result)
+            for field in LIST_FIELDS:
+                if field in row:
+                    row[field] = ';'.join(row[field])
+            self.writer.writerow(row)
+        else:
+            self.file.write(json.dumps(result) + '\n')
+        # Flushed per row so the file is an accurate checkpoint
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+def write_parquet(jsonl_path, parquet_path):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        sys.exit(f"Parquet output needs pyarrow; results are in {jsonl_path}")
+    with open(jsonl_path) as f:
+        rows = [json.loads(line) for line in f if line.strip()]
+    pq.write_table(pa.Table.from_pylist(rows), parquet_path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Extract and score resumes offline")
+    parser.add_argument('inputs', nargs='+', help="PDF files, directories or glob patterns")
+    parser.add_argument('--jobdesc', help="job description PDF to score every resume against")
+    parser.add_argument('--out', default='results.jsonl', help="output file (.jsonl, .csv or .parquet)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--page-workers', type=int, default=1,
+                        help="process documents one at a time, extracting long ones page-parallel "
+                             "with this many processes (for a few very large PDFs)")
+    parser.add_argument('--restart', action='store_true', help="ignore existing results instead of resuming")
+    args = parser.parse_args(argv)
+
+    fmt = os.path.splitext(args.out)[1].lower().lstrip('.')
+    if fmt not in ('jsonl', 'csv', 'parquet'):
+        parser.error("--out must end in .jsonl, .csv or .parquet")
+    # Parquet cannot be appended to, so work in JSON Lines and convert at the end
+    work_path = args.out + '.partial.jsonl' if fmt == 'parquet' else args.out
+    work_fmt = 'csv' if fmt == 'csv' else 'jsonl'
+    if args.restart and os.path.exists(work_path):
+        os.remove(work_path)
+
+    required_skills = weights = jobdesc_vector = None
+    if args.jobdesc:
+        try:
+            job = prepare_job(args.jobdesc)
+        except ValueError as e:
+            sys.exit(str(e))
+        required_skills, weights = job['required_skills'], job['weights']
+        # Sparse (indices, weights), small enough to send along with every task
+        jobdesc_vector = similarity.current().vector(extract_text(args.jobdesc)[0])
+
+    paths = find_pdfs(args.inputs)
+    done = completed_paths(work_path, work_fmt)
+    todo = [p for p in paths if p not in done]
+    print(f"{len(paths)} PDFs found, {len(paths) - len(todo)} already done, {len(todo)} to go", file=sys.stderr)
+
+    totals = dict.fromkeys(STAGES, 0.0)
+    processed = errors = 0
+    start = time.perf_counter()
+    writer = ResultWriter(work_path, work_fmt)
+    try:
+        for result in iter_results(todo, required_skills, weights, args.workers, args.page_workers, jobdesc_vector):
+            writer.write(result)
+            processed += 1
+            errors += result['error'] is not None
+            for stage in STAGES:
+                totals[stage] += result.get(f"{stage}_seconds", 0.0)
+            if processed % 500 == 0:
+                rate = processed / (time.perf_counter() - start)
+                print(f"{processed}/{len(todo)} ({rate:.1f} docs/s)", file=sys.stderr)
+    except KeyboardInterrupt:
+        print("interrupted; rerun the same command to resume", file=sys.stderr)
+        return 130
+    finally:
+        writer.close()
+    elapsed = time.perf_counter() - start
+
+    if fmt == 'parquet':
+        write_parquet(work_path, args.out)
+        os.remove(work_path)
+
+    rate = processed / elapsed if elapsed else 0.0
+    print(f"{processed} documents in {elapsed:.1f}s ({rate:.1f} docs/s), {errors} errors -> {args.out}")
+    stage_total = sum(totals.values()) or 1.0
+    for stage in STAGES:
+        print(f"  {stage:<8} {totals[stage]:9.2f}s  {totals[stage] * 100 / stage_total:5.1f}%  (summed over workers)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
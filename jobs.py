@@ -0,0 +1,202 @@
+import queue
+import threading
+import time
+import uuid
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+TIMEOUT = 'timeout'
+FINISHED_STATES = (DONE, FAILED, CANCELLED, TIMEOUT)
+
+
+class QueueFull(Exception):
+    pass
+
+
+class JobStopped(Exception):
+    # Raised from Job.check() inside a running job once it is cancelled or past its deadline
+    pass
+
+
+class Job:
+    def __init__(self, fn, args, timeout, key=None, lease=None):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.fn = fn
+        self.args = args
+        self.timeout = timeout
+        self.status = QUEUED
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.deadline = None
+        # A leased job is one nobody is waiting for yet: unless renewed or claimed
+        # before lease_until it is cancelled at its next check(), or never started
+        self.lease_until = self.created + lease if lease else None
+        self._cancelled = threading.Event()
+        self._changed = threading.Condition()
+
+    def _set(self, status, result=None, error=None):
+        with self._changed:
+            if self.status in FINISHED_STATES:
+                return
+            self.status = status
+            if status == RUNNING:
+                self.started = time.time()
+                self.deadline = self.started + self.timeout if self.timeout else None
+            elif status in FINISHED_STATES:
+                self.finished = time.time()
+                self.result = result
+                self.error = error
+            self._changed.notify_all()
+
+    def check(self):
+        # Cooperative stop point: pipelines call this between (and inside) their stages
+        if self._cancelled.is_set() or self.lapsed():
+            raise JobStopped(CANCELLED)
+        if self.deadline is not None and time.time() > self.deadline:
+            raise JobStopped(TIMEOUT)
+
+    def poll(self):
+        # A job stuck in a single long stage is reported as timed out without waiting for it
+        if self.status == RUNNING and self.deadline is not None and time.time() > self.deadline:
+            self._set(TIMEOUT, error='Job exceeded its time limit')
+        return self.status
+
+    def lapsed(self):
+        return self.lease_until is not None and time.time() > self.lease_until
+
+    def renew(self, lease):
+        # Pushes a leased job's lease out to at least lease seconds from now
+        if self.lease_until is not None:
+            self.lease_until = max(self.lease_until, time.time() + lease)
+
+    def claim(self):
+        # Someone is now waiting for the result, so the job no longer lapses
+        self.lease_until = None
+
+    def cancel(self):
+        self._cancelled.set()
+        if self.status in (QUEUED, RUNNING):
+            self._set(CANCELLED, error='Job was cancelled')
+
+    def wait(self, timeout=None):
+        # Block until the status changes (or timeout) and return the current status
+        with self._changed:
+            if self.poll() not in FINISHED_STATES:
+                self._changed.wait(timeout)
+        return self.poll()
+
+    def to_dict(self):
+        status = self.poll()
+        return {
+            'id': self.id,
+            'status': status,
+            'error': self.error,
+            'created': self.created,
+            'started': self.started,
+            'finished': self.finished,
+        }
+
+
+class JobQueue:
+    # In-process job runner: a bounded queue drained by a fixed set of worker
+    # threads. Nothing outside the stdlib is needed, which is enough for a
+    # single web process; submit() raises QueueFull instead of queueing without
+    # limit so callers can push back on clients.
+
+    def __init__(self, workers=4, max_queued=32, timeout=120, keep_finished=600):
+        self.workers = workers
+        self.max_queued = max_queued
+        self.timeout = timeout
+        self.keep_finished = keep_finished
+        self._queue = queue.Queue(maxsize=max_queued)
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._threads = []
+        self.stats = {'submitted': 0, 'rejected': 0, 'done': 0, 'failed': 0, 'cancelled': 0, 'timeout': 0}
+
+    def _ensure_started(self):
+        # Threads are started lazily so importing the app (or forking workers) does not spawn them
+        if self._threads:
+            return
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                t = threading.Thread(target=self._worker, name=f"analysis-worker-{i}", daemon=True)
+                t.start()
+                self._threads.append(t)
+
+    def _worker(self):
+        while True:
+            job = self._queue.get()
+            try:
+                self._run(job)
+            finally:
+                self._queue.task_done()
+
+    def _run(self, job):
+        if job.status == QUEUED:
+            self._execute(job)
+        with self._lock:
+            self.stats[job.status] = self.stats.get(job.status, 0) + 1
+
+    def _execute(self, job):
+        job._set(RUNNING)
+        try:
+            job.check()
+            result = job.fn(job, *job.args)
+            job.check()
+            job._set(DONE, result=result)
+        except JobStopped as e:
+            reason = str(e)
+            job._set(reason, error='Job was cancelled' if reason == CANCELLED else 'Job exceeded its time limit')
+        except Exception as e:
+            job._set(FAILED, error=str(e))
+
+    def _prune(self):
+        cutoff = time.time() - self.keep_finished
+        with self._lock:
+            for job_id in [j.id for j in self._jobs.values() if j.finished and j.finished < cutoff]:
+                del self._jobs[job_id]
+
+    def submit(self, fn, *args, key=None, timeout=None, lease=None):
+        # fn is called as fn(job, *args) and should call job.check() between stages
+        self._ensure_started()
+        self._prune()
+        job = Job(fn, args, self.timeout if timeout is None else timeout, key=key, lease=lease)
+        with self._lock:
+            self._jobs[job.id] = job
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            with self._lock:
+                del self._jobs[job.id]
+                self.stats['rejected'] += 1
+            raise QueueFull(f"Analysis queue is full ({self.max_queued} jobs waiting)")
+        with self._lock:
+            self.stats['submitted'] += 1
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        job = self.get(job_id)
+        if job is not None:
+            job.cancel()
+        return job
+
+    def depth(self):
+        return self._queue.qsize()
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.stats, queued=self._queue.qsize(), max_queued=self.max_queued, workers=self.workers)
@@ -0,0 +1,127 @@
+import threading
+import time
+from contextlib import contextmanager
+
+# Bucket upper bounds; every histogram also gets +Inf
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+SIZE_BUCKETS = (1e3, 1e4, 5e4, 1e5, 5e5, 1e6, 5e6, 1e7)
+
+PREFIX = 'skillgap_'
+
+# What each histogram measures and its buckets; names not listed here use SECONDS_BUCKETS
+HISTOGRAMS = {
+    'stage_seconds': ("Time spent in one pipeline stage", SECONDS_BUCKETS),
+    'http_request_seconds': ("Request latency by endpoint", SECONDS_BUCKETS),
+    'pdf_pages': ("Pages read per extracted PDF", COUNT_BUCKETS),
+    'pdf_text_chars': ("Characters of text per extracted PDF", SIZE_BUCKETS),
+    'skills_found': ("Skills matched per document", COUNT_BUCKETS),
+    'report_bytes': ("Size of each built PDF report", SIZE_BUCKETS),
+}
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.sum += value
+
+
+class Registry:
+    # Per-process histograms in Prometheus' cumulative-bucket form. Stage
+    # timings are also appended to the current thread's trace, if one is
+    # active, so a single request can report where its own time went.
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._local = threading.local()
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(HISTOGRAMS.get(name, ('', SECONDS_BUCKETS))[1])
+            histogram.observe(value)
+
+    @contextmanager
+    def stage(self, name):
+        trace = getattr(self._local, 'trace', None)
+        depth = getattr(self._local, 'depth', 0)
+        self._local.depth = depth + 1
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self._local.depth = depth
+            self.observe('stage_seconds', elapsed, stage=name)
+            if trace is not None:
+                trace.append((start, depth, name, elapsed))
+
+    def start_trace(self):
+        self._local.trace = []
+        self._local.depth = 0
+
+    def stop_trace(self):
+        # [(depth, stage, seconds)] in the order the stages started
+        trace = getattr(self._local, 'trace', None) or []
+        self._local.trace = None
+        return [(depth, name, elapsed) for _start, depth, name, elapsed in sorted(trace)]
+
+    def render(self, gauges=None):
+        # Prometheus text exposition format; gauges maps metric name -> value
+        lines = []
+        with self._lock:
+            items = sorted(self._histograms.items())
+            by_name = {}
+            for (name, labels), histogram in items:
+                by_name.setdefault(name, []).append((labels, histogram.buckets, list(histogram.counts), histogram.sum))
+        for name, series in by_name.items():
+            metric = PREFIX + name
+            lines.append(f"# HELP {metric} {HISTOGRAMS.get(name, ('',))[0]}")
+            lines.append(f"# TYPE {metric} histogram")
+            for labels, buckets, counts, total in series:
+                base = ','.join(f'{k}="{_escape(v)}"' for k, v in labels)
+                cumulative = 0
+                for bound, count in zip(list(buckets) + ['+Inf'], counts):
+                    cumulative += count
+                    le = bound if bound == '+Inf' else _number(bound)
+                    lines.append(f'{metric}_bucket{{{base + "," if base else ""}le="{le}"}} {cumulative}')
+                suffix = f"{{{base}}}" if base else ''
+                lines.append(f"{metric}_sum{suffix} {_number(total)}")
+                lines.append(f"{metric}_count{suffix} {cumulative}")
+        for name, value in sorted((gauges or {}).items()):
+            metric = PREFIX + name
+            lines.append(f"# TYPE {metric} gauge")
+            lines.append(f"{metric} {_number(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def flatten_snapshot(component, snapshot):
+    # {'hits': 3, 'entries': 10} -> {'<component>_hits': 3, ...}; non-numeric values are dropped
+    return {f"{component}_{key}": value for key, value in snapshot.items()
+            if isinstance(value, (int, float)) and not isinstance(value, bool)}
+
+
+registry = Registry()
+observe = registry.observe
+stage = registry.stage
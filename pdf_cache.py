@@ -0,0 +1,192 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+from caching import LRUCache
+
+HASH_CHUNK_SIZE = 1024 * 1024
+# Layout of a disk entry (JSON text plus extraction stats); part of the directory name
+ENTRY_FORMAT = 2
+
+logger = logging.getLogger(__name__)
+
+
+def file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class PdfTextCache:
+    # Extracted text keyed by the sha256 of the PDF bytes, so re-uploads of the
+    # same document (under a new uuid filename) never hit the parser again.
+    # extract returns (text, stats) and both are cached, so callers can still
+    # tell an image-only or truncated document apart. Text cut short by the
+    # time budget depends on machine load rather than on the document, so it
+    # is returned but never cached. Recent entries live in an in-memory LRU
+    # bounded by entry count and total text size; every entry is also written
+    # to cache_dir so results survive a restart. Disk entries live under the
+    # extractor's version (a string, or a function called on first use), and
+    # entries from other versions are deleted; the disk store is trimmed to
+    # max_disk_bytes, least recently used first. It is only a cache: an
+    # unreadable entry counts as a miss and is removed, and a failed write is
+    # logged rather than failing the caller.
+
+    def __init__(self, extract, cache_dir, max_entries=256, version='0', max_disk_bytes=None,
+                 max_memory_bytes=None):
+        self.extract = extract
+        self.cache_dir = cache_dir
+        self.max_disk_bytes = max_disk_bytes
+        self._version = version
+        self._version_dir = None
+        self._disk_bytes = None
+        # Entries are (text, stats); the text is what takes the room
+        self._memory = LRUCache(max_entries=max_entries, max_bytes=max_memory_bytes,
+                                sizeof=lambda entry: len(entry[0]))
+        self._lock = threading.Lock()
+        self._disk_lock = threading.Lock()
+        self.stats = {'disk_hits': 0, 'misses': 0, 'disk_evictions': 0, 'disk_errors': 0, 'uncached': 0}
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _disk_root(self):
+        if self._version_dir is None:
+            with self._disk_lock:
+                if self._version_dir is None:
+                    version = self._version() if callable(self._version) else self._version
+                    version = f"{version}-f{ENTRY_FORMAT}"
+                    name = 'v' + ''.join(c if c.isalnum() or c in '.-' else '_' for c in version)
+                    for entry in os.listdir(self.cache_dir):
+                        if entry != name:
+                            # Written by another extractor version (or the unversioned layout)
+                            shutil.rmtree(os.path.join(self.cache_dir, entry), ignore_errors=True)
+                    self._version_dir = os.path.join(self.cache_dir, name)
+        return self._version_dir
+
+    def _disk_path(self, digest):
+        return os.path.join(self._disk_root(), digest[:2], digest + '.json')
+
+    def _disk_files(self):
+        for root, _dirs, files in os.walk(self._disk_root()):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield st.st_mtime, st.st_size, path
+
+    def _account(self, size):
+        # Keeps a running total of the disk store and trims it, oldest use first, once over the bound
+        if self.max_disk_bytes is None:
+            return
+        with self._disk_lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = sum(size for _mtime, size, _path in self._disk_files())
+            self._disk_bytes += size
+            if self._disk_bytes <= self.max_disk_bytes:
+                return
+            # Rescan, since other processes share the directory, and trim to 80% so this is not redone per write
+            files = sorted(self._disk_files())
+            total = sum(size for _mtime, size, _path in files)
+            evicted = 0
+            for _mtime, size, path in files:
+                if total <= self.max_disk_bytes * 0.8:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                evicted += 1
+            self._disk_bytes = total
+        with self._lock:
+            self.stats['disk_evictions'] += evicted
+
+    def _disk_error(self, message, *args):
+        logger.warning(message, *args)
+        with self._lock:
+            self.stats['disk_errors'] += 1
+
+    def _read_disk(self, digest):
+        path = self._disk_path(digest)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                stored = json.load(f)
+            text, stats = stored['text'], stored['stats']
+            if not isinstance(text, str) or not isinstance(stats, dict):
+                raise ValueError("unexpected entry layout")
+            # The modification time doubles as the last use for trimming
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            # Truncated or otherwise damaged: drop it so the PDF is extracted and written again
+            self._disk_error("Discarding unreadable text cache entry %s: %s", path, e)
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        return text, stats
+
+    def _write_disk(self, digest, text, stats):
+        path = self._disk_path(digest)
+        # Write to a temp file and rename so a concurrent reader never sees a partial entry
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'text': text, 'stats': stats}, f)
+            os.replace(tmp_path, path)
+            size = os.path.getsize(path)
+        except (OSError, ValueError) as e:
+            self._disk_error("Could not write text cache entry %s: %s", path, e)
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return
+        self._account(size)
+
+    def get(self, digest):
+        # (text, stats), or None when the document has not been extracted yet
+        entry = self._memory.get(digest)
+        if entry is not None:
+            return entry
+        entry = self._read_disk(digest)
+        if entry is not None:
+            with self._lock:
+                self.stats['disk_hits'] += 1
+            self._memory.set(digest, entry)
+        return entry
+
+    def text_for(self, path, digest=None, **extract_kwargs):
+        # (text, stats) for the PDF at path
+        if digest is None:
+            digest = file_sha256(path)
+        entry = self.get(digest)
+        if entry is not None:
+            return entry
+        with self._lock:
+            self.stats['misses'] += 1
+        text, stats = self.extract(path, **extract_kwargs)
+        if stats.get('stopped') == 'max_seconds':
+            with self._lock:
+                self.stats['uncached'] += 1
+            return text, stats
+        self._write_disk(digest, text, stats)
+        self._memory.set(digest, (text, stats))
+        return text, stats
+
+    def snapshot(self):
+        memory = self._memory.snapshot()
+        with self._lock:
+            return dict(self.stats, hits=memory['hits'], evictions=memory['evictions'], entries=memory['entries'],
+                        bytes=memory['bytes'], max_entries=self._memory.max_entries)
+
+    def clear(self):
+        self._memory.clear()
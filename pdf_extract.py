@@ -0,0 +1,200 @@
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+
+# Budgets for a single document. Whatever is extracted before a budget runs out
+# is returned, so one huge or hostile upload cannot take a worker with it.
+MAX_PAGES = 300
+MAX_CHARS = 2000000
+MAX_SECONDS = 20.0
+
+# Characters carried over from the previous page when matching page by page,
+# so a skill split across a page break is still found.
+PAGE_OVERLAP_CHARS = 200
+
+# Documents with at least this many pages (within MAX_PAGES) have their pages
+# extracted by a process pool, one contiguous page range per worker. Below
+# that, starting the ranges costs more than it saves (each worker re-parses
+# the file's cross-reference table). workers=1 forces the serial path, and so
+# does running inside a child process: a pool nested in another pool's worker
+# can deadlock when that worker exits.
+PARALLEL_MIN_PAGES = 40
+PARALLEL_WORKERS = min(4, os.cpu_count() or 1)
+
+# Bump whenever extracted text changes for the same PDF, so caches keyed on
+# extractor_version() stop serving text from the old extractor
+EXTRACTOR_VERSION = 1
+
+_page_pool = None
+_page_pool_workers = 0
+_page_pool_lock = threading.Lock()
+
+
+def _no_check():
+    pass
+
+
+def extractor_version():
+    # PyPDF2's output differs between releases, so its version is part of ours; imported on first use
+    import PyPDF2
+    return f"{EXTRACTOR_VERSION}-pypdf2-{PyPDF2.__version__}"
+
+
+def new_stats():
+    return {'pages_total': 0, 'pages_read': 0, 'chars': 0, 'bytes': 0, 'seconds': 0.0,
+            'image_only': False, 'stopped': None, 'parallel_workers': 0}
+
+
+def _resources_have_fonts(resources, depth=0):
+    if not resources:
+        return False
+    resources = resources.get_object()
+    if resources.get('/Font'):
+        return True
+    # Text can also live inside form XObjects with their own resources
+    xobjects = resources.get('/XObject')
+    if not xobjects or depth > 2:
+        return False
+    for ref in xobjects.get_object().values():
+        xobject = ref.get_object()
+        if xobject.get('/Subtype') == '/Form' and _resources_have_fonts(xobject.get('/Resources'), depth + 1):
+            return True
+    return False
+
+
+def is_image_only(reader, max_pages=MAX_PAGES):
+    # A page without any font resources cannot produce text, so a document with
+    # no fonts at all is a scan; this only reads page dictionaries, not content streams.
+    for i, page in enumerate(reader.pages):
+        if i >= max_pages:
+            break
+        if _resources_have_fonts(page.get('/Resources')):
+            return False
+    return True
+
+
+def _extract_page_range(path, start, stop):
+    # Runs in a pool worker
+    import PyPDF2
+    with open(path, 'rb') as f:
+        reader = PyPDF2.PdfReader(f)
+        return [reader.pages[i].extract_text() or '' for i in range(start, stop)]
+
+
+def _get_page_pool(workers):
+    # One long-lived pool per process, so its workers are already warm for the next document
+    global _page_pool, _page_pool_workers
+    with _page_pool_lock:
+        if _page_pool is None or _page_pool_workers != workers:
+            if _page_pool is not None:
+                _page_pool.shutdown(wait=False)
+            _page_pool = ProcessPoolExecutor(max_workers=workers)
+            _page_pool_workers = workers
+        return _page_pool
+
+
+def _parallel_page_getters(path, total, limit, workers, check):
+    # One getter per page, in order, mirroring page.extract_text on the serial
+    # path; waiting on a range still calls check() so cancellation stays responsive.
+    pool = _get_page_pool(workers)
+    size = -(-limit // workers)
+    futures = [(start, pool.submit(_extract_page_range, path, start, min(start + size, limit)))
+               for start in range(0, limit, size)]
+
+    def getter(i):
+        start, future = futures[i // size]
+        while True:
+            try:
+                return future.result(timeout=0.05)[i - start]
+            except FutureTimeout:
+                check()
+    try:
+        for i in range(total):
+            # Pages past the limit are never called; the max_pages budget stops first
+            yield (lambda i=i: getter(i)) if i < limit else None
+    finally:
+        for _start, future in futures:
+            future.cancel()
+
+
+def iter_pdf_pages(path, max_pages=MAX_PAGES, max_chars=MAX_CHARS, max_seconds=MAX_SECONDS,
+                   stats=None, check=_no_check, workers=None):
+    # Yields the text of each page in order while enforcing the page, character
+    # and time budgets. stats is filled in as pages are read; stats['stopped']
+    # names the budget that ended extraction early, if any. Long documents are
+    # extracted page-parallel (see PARALLEL_MIN_PAGES) with identical output.
+    # Imported on first parse so that importing the app does not pay for PyPDF2
+    import PyPDF2
+    if stats is None:
+        stats = new_stats()
+    start = time.perf_counter()
+    getters = None
+    try:
+        with open(path, 'rb') as f:
+            reader = PyPDF2.PdfReader(f)
+            stats['pages_total'] = len(reader.pages)
+            if is_image_only(reader, max_pages):
+                stats['image_only'] = True
+                stats['stopped'] = 'image_only'
+                return
+            total = stats['pages_total']
+            limit = min(total, max_pages)
+            workers = PARALLEL_WORKERS if workers is None else workers
+            if workers > 1 and limit >= PARALLEL_MIN_PAGES and multiprocessing.parent_process() is None:
+                stats['parallel_workers'] = workers
+                getters = _parallel_page_getters(path, total, limit, workers, check)
+            else:
+                getters = (page.extract_text for page in reader.pages)
+            for i, get_text in enumerate(getters):
+                if i >= max_pages:
+                    stats['stopped'] = 'max_pages'
+                    return
+                if time.perf_counter() - start > max_seconds:
+                    stats['stopped'] = 'max_seconds'
+                    return
+                check()
+                content = get_text() or ''
+                stats['pages_read'] += 1
+                remaining = max_chars - stats['chars']
+                if len(content) > remaining:
+                    content = content[:remaining]
+                    stats['stopped'] = 'max_chars'
+                if content:
+                    stats['chars'] += len(content)
+                    stats['bytes'] += len(content.encode('utf-8', 'surrogatepass'))
+                    yield content
+                if stats['stopped']:
+                    return
+    finally:
+        if getters is not None:
+            getters.close()
+        stats['seconds'] = time.perf_counter() - start
+
+
+def extract_text(path, check=_no_check, **limits):
+    stats = new_stats()
+    text = ''.join(iter_pdf_pages(path, stats=stats, check=check, **limits))
+    return text, stats
+
+
+def match_skills_streaming(path, matcher, check=_no_check, **limits):
+    # Feeds pages to the matcher as they are extracted and stops reading as soon
+    # as every skill in the taxonomy has been seen. Returns (skills found, stats).
+    stats = new_stats()
+    wanted = set(matcher.skills)
+    found = set()
+    carry = ''
+    pages = iter_pdf_pages(path, stats=stats, check=check, **limits)
+    try:
+        for content in pages:
+            found |= matcher.present(carry + content)
+            carry = content[-PAGE_OVERLAP_CHARS:]
+            if found >= wanted:
+                if stats['pages_read'] < stats['pages_total'] and not stats['stopped']:
+                    stats['stopped'] = 'all_skills_matched'
+                break
+    finally:
+        pages.close()
+    return found, stats
@@ -0,0 +1,198 @@
+from reportlab.lib.pagesizes import letter
+from reportlab.lib import colors
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+from reportlab.graphics.shapes import Drawing, String
+from reportlab.graphics.charts.piecharts import Pie
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import inch
+from datetime import datetime
+import copy
+import hashlib
+import io
+import json
+import logging
+import threading
+import time
+from caching import LRUCache
+from metrics import observe, stage
+
+PIE_CHART_ENTRIES = 128
+REPORT_CACHE_ENTRIES = 256
+REPORT_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+logger = logging.getLogger(__name__)
+
+# Page setup and styles are built once when the module is first imported
+PAGE_SETUP = dict(pagesize=letter, rightMargin=50, leftMargin=50, topMargin=50, bottomMargin=50)
+STYLES = getSampleStyleSheet()
+TITLE_STYLE = ParagraphStyle('CustomTitle', parent=STYLES['Heading1'], fontSize=20, textColor=colors.HexColor('#0078D7'), spaceAfter=12, alignment=1)
+HEADING_STYLE = ParagraphStyle('CustomHeading', parent=STYLES['Heading2'], fontSize=14, textColor=colors.HexColor('#0078D7'), spaceAfter=10)
+NORMAL_STYLE = STYLES['Normal']
+SUMMARY_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#0078D7')),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 12),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+    ('GRID', (0, 0), (-1, -1), 1, colors.grey)
+])
+SKILLS_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#0078D7')),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 11),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+    ('GRID', (0, 0), (-1, -1), 1, colors.grey),
+    ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.lightgrey])
+])
+
+# Finished PDFs keyed by report_key(), bounded by total size
+report_cache = LRUCache(max_entries=REPORT_CACHE_ENTRIES, max_bytes=REPORT_CACHE_MAX_BYTES)
+build_stats = {'builds': 0, 'build_seconds_total': 0.0, 'build_seconds_max': 0.0, 'last_build_seconds': 0.0, 'last_bytes': 0}
+_stats_lock = threading.Lock()
+_building = {}
+_building_lock = threading.Lock()
+
+# Rendered pie charts keyed by their (skills, weights, statuses) inputs
+pie_charts = LRUCache(max_entries=PIE_CHART_ENTRIES)
+
+def make_pie_chart(skills, weights, statuses):
+    # Vector pie chart as a ReportLab Drawing; no pyplot global state, so it is
+    # safe under a threaded server. The widget is expanded into plain shapes
+    # before caching; drawing one sets and clears attributes on it, so callers
+    # each get their own deep copy and the cached drawing itself is never rendered.
+    key = (tuple(skills), tuple(weights[s] for s in skills), tuple(statuses[s] for s in skills))
+    drawing = pie_charts.get(key)
+    if drawing is not None:
+        return copy.deepcopy(drawing)
+    data = [weights[s] for s in skills]
+    total = sum(data) or 1
+    size = 4 * inch
+    drawing = Drawing(size, size)
+    drawing.add(String(size / 2, size - 14, "Skill Market Weights (% matched/lacking)",
+                       fontName='Helvetica-Bold', fontSize=11, fillColor=colors.HexColor('#0078D7'),
+                       textAnchor='middle'))
+    pie = Pie()
+    pie.width = pie.height = 1.9 * inch
+    pie.x = (size - pie.width) / 2
+    pie.y = (size - 24 - pie.height) / 2
+    pie.data = data
+    pie.labels = [f"{s.title()} ({statuses[s]}) {w * 100 / total:.1f}%" for s, w in zip(skills, data)]
+    pie.startAngle = 140
+    pie.direction = 'anticlockwise'
+    pie.sideLabels = True
+    pie.slices.strokeColor = colors.white
+    pie.slices.strokeWidth = 1
+    pie.slices.fontName = 'Helvetica'
+    pie.slices.fontSize = 7
+    for i, s in enumerate(skills):
+        pie.slices[i].fillColor = colors.HexColor("#27ae60" if statuses[s] == 'Matched' else "#c0392b")
+    drawing.add(pie)
+    drawing = drawing.expandUserNodes()
+    pie_charts.set(key, drawing)
+    return copy.deepcopy(drawing)
+
+def report_date():
+    return datetime.now().strftime('%B %d, %Y')
+
+def report_key(data, analysis_date):
+    payload = json.dumps([data, analysis_date], sort_keys=True).encode('utf-8')
+    return hashlib.sha256(payload).hexdigest()
+
+def report_pdf(data):
+    # Cached PDF bytes for an analysis. Concurrent callers for the same report
+    # (a background prebuild and a download, say) share a single build.
+    analysis_date = report_date()
+    key = report_key(data, analysis_date)
+    pdf = report_cache.get(key)
+    if pdf is not None:
+        return pdf
+    with _building_lock:
+        lock = _building.setdefault(key, threading.Lock())
+    with lock:
+        pdf = report_cache.get(key)
+        if pdf is None:
+            pdf = build_report_pdf(data, analysis_date)
+            report_cache.set(key, pdf)
+    with _building_lock:
+        _building.pop(key, None)
+    return pdf
+
+def build_report_pdf(data, analysis_date=None):
+    start = time.perf_counter()
+    if analysis_date is None:
+        analysis_date = report_date()
+    with stage('pie_chart'):
+        pie_chart = make_pie_chart(
+            data['required_skills'],
+            data['weights'],
+            data['status_map']
+        )
+
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, **PAGE_SETUP)
+    story = []
+    story.append(Paragraph("Skill Gap Analysis Report", TITLE_STYLE))
+    story.append(Spacer(1, 0.2 * inch))
+    story.append(Paragraph(f"<b>Candidate:</b> {data['user_name']}", NORMAL_STYLE))
+    story.append(Paragraph(f"<b>Email:</b> {data['user_email']}", NORMAL_STYLE))
+    story.append(Paragraph(f"<b>Analysis Date:</b> {analysis_date}", NORMAL_STYLE))
+    story.append(Spacer(1, 0.3 * inch))
+    story.append(Paragraph("Summary Statistics", HEADING_STYLE))
+    summary_data = [
+        ['Metric', 'Value'],
+        ['Total Skills Required', str(data['total_skills'])],
+        ['Skills Matched', str(data['matched_count'])],
+        ['Skills Lacking', str(data['lacking_count'])],
+        ['Suitability (%)', f"{data['pie_data'][0]}%"]
+    ]
+    if 'similarity' in data:
+        # Absent from analyses stored in sessions before the score existed
+        summary_data.append(['Text Similarity (%)', f"{data['similarity']}%"])
+    summary_table = Table(summary_data, colWidths=[3 * inch, 2 * inch])
+    summary_table.setStyle(SUMMARY_TABLE_STYLE)
+    story.append(summary_table)
+    story.append(Spacer(1, 0.3 * inch))
+    story.append(Paragraph("Skill Distribution Pie Chart (Market Weights)", HEADING_STYLE))
+    story.append(pie_chart)
+    story.append(Spacer(1, 0.3 * inch))
+    story.append(Paragraph("Required Skills", HEADING_STYLE))
+    story.append(Paragraph(", ".join(data['required_skills']), NORMAL_STYLE))
+    story.append(Spacer(1, 0.2 * inch))
+    story.append(Paragraph("Matched Skills", HEADING_STYLE))
+    if data['matching_skills']:
+        story.append(Paragraph(", ".join(data['matching_skills']), NORMAL_STYLE))
+    else:
+        story.append(Paragraph("No skills matched", NORMAL_STYLE))
+    story.append(Spacer(1, 0.2 * inch))
+    story.append(Paragraph("Lacking Skills", HEADING_STYLE))
+    if data['missing_skills']:
+        story.append(Paragraph(", ".join(data['missing_skills']), NORMAL_STYLE))
+    else:
+        story.append(Paragraph("All required skills are matched!", NORMAL_STYLE))
+    story.append(Spacer(1, 0.3 * inch))
+    story.append(Paragraph("Detailed Skills Breakdown (Weights per market)", HEADING_STYLE))
+    skills_data = [['Skill', 'Weight %', 'Status']]
+    for skill in data['detailed_skills']:
+        status = 'Matched' if skill['name'].lower() in [s.lower() for s in data['matching_skills']] else 'Lacking'
+        skills_data.append([skill['name'], f"{skill['percent']}%", status])
+    skills_table = Table(skills_data, colWidths=[2.5 * inch, 1.5 * inch, 1.5 * inch])
+    skills_table.setStyle(SKILLS_TABLE_STYLE)
+    story.append(skills_table)
+    with stage('report_layout'):
+        doc.build(story)
+    pdf = buffer.getvalue()
+    observe('report_bytes', len(pdf))
+    elapsed = time.perf_counter() - start
+    with _stats_lock:
+        build_stats['builds'] += 1
+        build_stats['build_seconds_total'] += elapsed
+        build_stats['build_seconds_max'] = max(build_stats['build_seconds_max'], elapsed)
+        build_stats['last_build_seconds'] = elapsed
+        build_stats['last_bytes'] = len(pdf)
+    logger.info("Built PDF report in %.1fms (%d bytes)", elapsed * 1000, len(pdf))
+    return pdf
@@ -0,0 +1,157 @@
+import numpy as np
+from analysis import compute_job_weights, current_taxonomy
+
+# Bound on the temporaries of one block of resumes (the unpacked skill columns
+# plus the block x jobs scores); blocks are sized to stay under it.
+BLOCK_BYTES = 64 * 1024 ** 2
+
+
+class ScoringEngine:
+    # Scores many resumes against many jobs at once. Resumes are kept as packed
+    # bit rows over the taxonomy (uint64 words of 64 skills), so 100k resumes
+    # over a 10k-skill taxonomy take 125MB rather than a 4GB float matrix, and
+    # jobs as their required columns with compute_job_weights weights. Scoring
+    # goes one block of resumes at a time: only the columns some job requires
+    # are unpacked to 0/1, and matched weight and matched count for the block
+    # are matrix products. Weights are carried as integer tenths
+    # (compute_job_weights rounds to one decimal), which float32 represents
+    # exactly, so suitability equals what score_candidate reports for the pair.
+
+    def __init__(self, skills=None):
+        self.skills = list(skills if skills is not None else current_taxonomy().skills)
+        self.index = {skill: i for i, skill in enumerate(self.skills)}
+        self.words = (len(self.skills) + 63) // 64
+
+    def encode(self, skill_sets):
+        # (N, words) uint64 rows; skill i is bit i % 64 of word i // 64
+        rows, cols = [], []
+        for row, skills in enumerate(skill_sets):
+            found = [self.index[s] for s in skills if s in self.index]
+            rows.extend([row] * len(found))
+            cols.extend(found)
+        packed = np.zeros((len(skill_sets), self.words), dtype=np.uint64)
+        cols = np.asarray(cols, dtype=np.int64)
+        np.bitwise_or.at(packed, (np.asarray(rows, dtype=np.int64), cols >> 6),
+                         np.left_shift(np.uint64(1), (cols & 63).astype(np.uint64)))
+        return packed
+
+    def encode_jobs(self, required_skill_sets):
+        # {'cols', 'weight_tenths', 'count'}: each job's required taxonomy columns and their
+        # weights, padded to the longest job, with each job weighted exactly as /analyze weights it
+        per_job = []
+        for skills in required_skill_sets:
+            required_skills = sorted(s for s in set(skills) if s in self.index)
+            weights = compute_job_weights(required_skills) if required_skills else {}
+            per_job.append([(self.index[s], round(weights[s] * 10)) for s in required_skills])
+        width = max((len(job) for job in per_job), default=0)
+        cols = np.zeros((len(per_job), width), dtype=np.int64)
+        weight_tenths = np.zeros((len(per_job), width), dtype=np.float32)
+        count = np.zeros(len(per_job), dtype=np.int32)
+        for row, job in enumerate(per_job):
+            count[row] = len(job)
+            if job:
+                cols[row, :len(job)], weight_tenths[row, :len(job)] = zip(*job)
+        return {'cols': cols, 'weight_tenths': weight_tenths, 'count': count}
+
+    def _job_matrices(self, jobs):
+        # The columns any job requires, and (columns, M) float32 matrices over
+        # them: weight tenths, and 1 for every required skill
+        m, width = jobs['cols'].shape
+        valid = np.arange(width) < jobs['count'][:, None]
+        used, inverse = np.unique(jobs['cols'][valid], return_inverse=True)
+        job_rows = np.broadcast_to(np.arange(m)[:, None], valid.shape)[valid]
+        tenths = np.zeros((len(used), m), dtype=np.float32)
+        tenths[inverse, job_rows] = jobs['weight_tenths'][valid]
+        required = np.zeros_like(tenths)
+        required[inverse, job_rows] = 1
+        return used, tenths, required
+
+    def _blocks(self, resumes, used, matrix, chunk_size=None):
+        # (start, block @ matrix) per block of resumes. Unpacking the used columns to
+        # 0/1 and ranking the output (keys plus argpartition indices) each take about
+        # 20 bytes a cell on the way.
+        rows = chunk_size or max(1, BLOCK_BYTES // max(1, 20 * (len(used) + matrix.shape[1])))
+        words, shifts = used >> 6, (used & 63).astype(np.uint64)
+        for start in range(0, resumes.shape[0], rows):
+            bits = (resumes[start:start + rows, words] >> shifts) & np.uint64(1)
+            yield start, bits.astype(np.float32) @ matrix
+
+    def score(self, resumes, jobs):
+        # Full (N, M) matrices; for very large grids use top_candidates/top_jobs instead
+        used, tenths, required = self._job_matrices(jobs)
+        m = tenths.shape[1]
+        matched_tenths = np.zeros((resumes.shape[0], m), dtype=np.float32)
+        matched_count = np.zeros_like(matched_tenths)
+        for start, block in self._blocks(resumes, used, np.concatenate([tenths, required], axis=1)):
+            matched_tenths[start:start + len(block)] = block[:, :m]
+            matched_count[start:start + len(block)] = block[:, m:]
+        total_count = jobs['count']
+        total_tenths = jobs['weight_tenths'].sum(axis=1)
+        return {
+            'suitability': matched_tenths / 10,
+            'lacking_percent': (total_tenths - matched_tenths) / 10,
+            'matched_count': matched_count.astype(np.int32),
+            'lacking_count': (total_count - matched_count).astype(np.int32),
+        }
+
+    def suitability(self, resumes, jobs):
+        used, tenths, _required = self._job_matrices(jobs)
+        out = np.zeros((resumes.shape[0], tenths.shape[1]), dtype=np.float32)
+        for start, block in self._blocks(resumes, used, tenths):
+            out[start:start + len(block)] = block / 10
+        return out
+
+    def matched_lacking(self, resume_row, jobs, job):
+        # Skill names behind one cell of the grid
+        cols = jobs['cols'][job, :jobs['count'][job]]
+        present = (resume_row[cols >> 6] >> (cols & 63).astype(np.uint64)) & np.uint64(1)
+        matched = [self.skills[c] for c, bit in zip(cols, present) if bit]
+        lacking = [self.skills[c] for c, bit in zip(cols, present) if not bit]
+        return sorted(matched), sorted(lacking)
+
+    def top_candidates(self, resumes, jobs, k=10, chunk_size=None):
+        # Best k resumes for every job: (indices, scores), both (M, k), best first
+        used, tenths, _required = self._job_matrices(jobs)
+        m = tenths.shape[1]
+        k = min(k, resumes.shape[0])
+        best_idx = np.zeros((m, 0), dtype=np.int64)
+        best_score = np.zeros((m, 0), dtype=np.float32)
+        for start, block in self._blocks(resumes, used, tenths, chunk_size):
+            block = block.T
+            idx = np.broadcast_to(np.arange(start, start + block.shape[1]), block.shape)
+            idx, block = _top_k(idx, block, k)
+            best_idx, best_score = _top_k(np.concatenate([best_idx, idx], axis=1),
+                                          np.concatenate([best_score, block], axis=1), k)
+        return best_idx, best_score / 10
+
+    def top_jobs(self, resumes, jobs, k=10, chunk_size=None):
+        # Best k jobs for every resume: (indices, scores), both (N, k), best first
+        used, tenths, _required = self._job_matrices(jobs)
+        m = tenths.shape[1]
+        k = min(k, m)
+        indices = [np.zeros((0, k), dtype=np.int64)]
+        scores = [np.zeros((0, k), dtype=np.float32)]
+        for _start, block in self._blocks(resumes, used, tenths, chunk_size):
+            top_idx, top_score = _top_k(np.broadcast_to(np.arange(m), block.shape), block, k)
+            indices.append(top_idx)
+            scores.append(top_score)
+        return np.concatenate(indices), np.concatenate(scores) / 10
+
+
+def _top_k(idx, tenths, k):
+    # Row-wise top k by score (whole tenths), best first, with equal scores ordered
+    # by index. Each score and index fold into one int64 key that is unique per row,
+    # so an argpartition on it can never cut a tie arbitrarily at the k boundary.
+    k = min(k, tenths.shape[1])
+    span = int(idx.max(initial=0)) + 1
+    fits = (int(tenths.max(initial=0)) + 1) * span < 2 ** 31
+    key = tenths.astype(np.int32 if fits else np.int64, order='C')
+    key *= span
+    key -= idx
+    if tenths.shape[1] > k:
+        part = np.argpartition(key, tenths.shape[1] - k, axis=1)[:, -k:]
+        key = np.take_along_axis(key, part, axis=1)
+        idx = np.take_along_axis(idx, part, axis=1)
+        tenths = np.take_along_axis(tenths, part, axis=1)
+    order = np.argsort(-key, axis=1)
+    return np.take_along_axis(idx, order, axis=1), np.take_along_axis(tenths, order, axis=1)
@@ -0,0 +1,235 @@
+import csv
+import io
+import json
+import os
+import shutil
+import tempfile
+import zipfile
+import zlib
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from werkzeug.utils import secure_filename
+from pdf_cache import file_sha256
+from upload_store import IncomingUpload, UploadRejected, check_pdf_file
+from analysis import pdf_text_cache, skill_set, skill_set_from_pdf, compute_job_weights, score_candidate
+
+# Limits for ZIPs of resumes: the upload size cap only bounds the compressed
+# archive, so members are checked against their declared uncompressed size
+MAX_ZIP_MEMBERS = 5000
+MAX_ZIP_MEMBER_BYTES = 20 * 1024 ** 2
+
+CSV_FIELDS = ['candidate', 'suitability', 'matched_count', 'lacking_count', 'total_skills',
+              'matching_skills', 'lacking_skills', 'pages', 'error']
+
+
+def prepare_job(jobdesc_path):
+    # Parse the job description and build its weight vector once for the whole batch
+    text, _stats = pdf_text_cache.text_for(jobdesc_path)
+    required_skills = sorted(skill_set(text))
+    if not required_skills:
+        raise ValueError("No known skills found in the job description")
+    return {'required_skills': required_skills, 'weights': compute_job_weights(required_skills)}
+
+
+# What reading a damaged, truncated, encrypted or oddly compressed archive member can raise
+ZIP_MEMBER_ERRORS = (zipfile.BadZipFile, zlib.error, EOFError, NotImplementedError, RuntimeError)
+
+
+def _error_result(name, required_skills, message):
+    # Nothing could be matched, so every required skill counts as lacking
+    return {'candidate': name, 'matching_skills': [], 'lacking_skills': list(required_skills), 'matched_count': 0,
+            'lacking_count': len(required_skills), 'total_skills': len(required_skills), 'suitability': 0.0,
+            'pages': 0, 'error': message}
+
+
+def _screen_one(name, path, required_skills, weights, error=None):
+    if error is not None:
+        return _error_result(name, required_skills, error)
+    result = {'candidate': name}
+    try:
+        # Resumes in a batch are rarely seen twice, so match them straight off the
+        # page stream instead of going through the text cache
+        resume_all, stats = skill_set_from_pdf(path)
+        result.update(score_candidate(resume_all, required_skills, weights))
+        result['pages'] = stats['pages_read']
+        result['error'] = None if not stats['image_only'] else 'No text layer (image-only PDF)'
+        # Lets the caller feed the candidate index without re-reading the file
+        result['resume_sha256'] = file_sha256(path)
+        result['resume_skills'] = sorted(resume_all)
+
+    except Exception as e:
+        return _error_result(name, required_skills, str(e))
+    return result
+
+
+class ArchiveRejected(ValueError):
+    pass
+
+
+def _pdf_members(archive):
+    return [m for m in archive.infolist() if not m.is_dir() and m.filename.lower().endswith('.pdf')]
+
+
+def check_zip(zip_source, max_members=MAX_ZIP_MEMBERS, max_member_bytes=MAX_ZIP_MEMBER_BYTES):
+    # Refuses archives with too many PDFs or a PDF that would unpack larger than max_member_bytes
+    try:
+        with zipfile.ZipFile(zip_source) as archive:
+            members = _pdf_members(archive)
+    except zipfile.BadZipFile as e:
+        raise ArchiveRejected(f"Not a valid ZIP archive: {e}")
+    if len(members) > max_members:
+        raise ArchiveRejected(f"ZIP holds {len(members)} PDFs; at most {max_members} are accepted")
+    for member in members:
+        if member.file_size > max_member_bytes:
+            raise ArchiveRejected(f"{member.filename} unpacks to {member.file_size} bytes; "
+                                  f"the limit is {max_member_bytes}")
+
+
+def iter_zip_resumes(zip_source, work_dir, max_member_bytes=MAX_ZIP_MEMBER_BYTES, archive_name=None):
+    # Extract one PDF member at a time so the archive is never unpacked all at once.
+    # Yields (name, path, None), or (name, None, error) for a member (or a whole
+    # archive) that cannot be read, so one bad member does not end the batch.
+    try:
+        archive = zipfile.ZipFile(zip_source)
+    except zipfile.BadZipFile as e:
+        yield archive_name or 'archive.zip', None, f"Not a valid ZIP archive: {e}"
+        return
+    with archive:
+        for index, member in enumerate(archive.infolist()):
+            if member.is_dir() or not member.filename.lower().endswith('.pdf'):
+                continue
+            if member.file_size > max_member_bytes:
+                continue  # refused by check_zip for uploads; skipped for archives that were not checked
+            name = os.path.basename(member.filename)
+            path = os.path.join(work_dir, f"{index}_{secure_filename(name) or 'resume.pdf'}")
+            try:
+                with archive.open(member) as src, open(path, 'wb') as dst:
+                    shutil.copyfileobj(src, dst)
+                # Junk is turned away here, as it would be if uploaded on its own, not by a worker
+                check_pdf_file(path)
+            except ZIP_MEMBER_ERRORS as e:
+                error = f"Could not extract from the ZIP: {e}"
+            except UploadRejected as e:
+                error = str(e)
+            else:
+                yield name, path, None
+                continue
+            if os.path.exists(path):
+                os.remove(path)
+            yield name, None, error
+
+
+def save_uploads(files, work_dir, max_zip_members=MAX_ZIP_MEMBERS, max_member_bytes=MAX_ZIP_MEMBER_BYTES):
+    # Uploaded file objects do not outlive the request, so spool them to disk
+    # before the streamed response starts; ZIPs are only unpacked lazily later,
+    # but are checked here so a refused archive fails before any result is sent.
+    # PDFs are held to max_member_bytes and the upload store's PDF checks.
+    saved = []
+    for index, f in enumerate(files):
+        if not f or not f.filename:
+            continue
+        path = os.path.join(work_dir, f"upload_{index}_{secure_filename(f.filename) or 'resume.pdf'}")
+        try:
+            if isinstance(f.stream, IncomingUpload):
+                # Capped and sniffed while the request was parsed; only the trailer check and a move are left
+                f.stream.move_to(path)
+            else:
+                f.save(path)
+                if not f.filename.lower().endswith('.zip'):
+                    check_pdf_file(path, max_member_bytes)
+        except UploadRejected as e:
+            raise type(e)(f"{f.filename}: {e}") from None
+        if f.filename.lower().endswith('.zip'):
+            check_zip(path, max_zip_members, max_member_bytes)
+        saved.append((f.filename, path))
+    return saved
+
+
+def iter_resume_files(saved, work_dir, max_member_bytes=MAX_ZIP_MEMBER_BYTES):
+    for name, path in saved:
+        if name.lower().endswith('.zip'):
+            yield from iter_zip_resumes(path, work_dir, max_member_bytes, archive_name=name)
+            os.remove(path)
+        else:
+            yield name, path, None
+
+
+def iter_bounded(pool, fn, items, max_in_flight):
+    # Yields (item, result) for fn(*item) as each finishes, keeping at most
+    # max_in_flight submitted at once, so items can be an arbitrarily long lazy iterator
+    items = iter(items)
+    pending = {}
+    exhausted = False
+    while pending or not exhausted:
+        while not exhausted and len(pending) < max_in_flight:
+            try:
+                item = next(items)
+            except StopIteration:
+                exhausted = True
+                break
+            pending[pool.submit(fn, *item)] = item
+        if not pending:
+            break
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            yield pending.pop(future), future.result()
+
+
+def screen_resumes(jobdesc_path, resumes, workers=None, job=None):
+    # Yields one result dict per (name, path, error) resume as soon as it is scored;
+    # an error (with path None) is reported as that resume's error row.
+    # Only about 2 * workers resumes are in flight at a time. Files are removed once scored.
+    if job is None:
+        job = prepare_job(jobdesc_path)
+    workers = workers or os.cpu_count() or 1
+    items = ((name, path, job['required_skills'], job['weights'], error) for name, path, error in resumes)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for (_name, path, _required, _weights, _error), result in iter_bounded(pool, _screen_one, items, workers * 2):
+            if path and os.path.exists(path):
+                os.remove(path)
+            yield result
+
+
+def screen_upload(jobdesc_path, files, workers=None, work_dir=None, job=None,
+                  max_zip_members=MAX_ZIP_MEMBERS, max_member_bytes=MAX_ZIP_MEMBER_BYTES):
+    # Python API for a JD plus uploaded PDFs and/or ZIP archives of PDFs. Raises
+    # ArchiveRejected for a ZIP over the limits, and UploadRejected for a PDF that
+    # is too large or not a PDF, before anything is screened.
+    if job is None:
+        job = prepare_job(jobdesc_path)
+    work_dir = tempfile.mkdtemp(prefix='screen_', dir=work_dir)
+    try:
+        saved = save_uploads(files, work_dir, max_zip_members, max_member_bytes)
+    except Exception:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        raise
+    return _screen_saved(jobdesc_path, saved, work_dir, workers, job, max_member_bytes)
+
+
+def _screen_saved(jobdesc_path, saved, work_dir, workers, job, max_member_bytes=MAX_ZIP_MEMBER_BYTES):
+    try:
+        resumes = iter_resume_files(saved, work_dir, max_member_bytes)
+        yield from screen_resumes(jobdesc_path, resumes, workers=workers, job=job)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def to_ndjson(results):
+    for result in results:
+        yield json.dumps(result) + "\n"
+
+
+def to_csv(results):
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, fieldnames=CSV_FIELDS, extrasaction='ignore')
+    writer.writeheader()
+    yield buf.getvalue()
+    buf.seek(0)
+    buf.truncate()
+    for result in results:
+        row = dict(result)
+        row['matching_skills'] = ';'.join(result['matching_skills'])
+        row['lacking_skills'] = ';'.join(result['lacking_skills'])
+        writer.writerow(row)
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
@@ -0,0 +1,149 @@
+import os
+import secrets
+import sqlite3
+import threading
+import time
+import zlib
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+from itsdangerous import BadSignature, Signer
+from werkzeug.datastructures import CallbackDict
+
+
+class ServerSession(CallbackDict, SessionMixin):
+    def __init__(self, initial=None, sid=None, new=False):
+        def on_update(self):
+            self.modified = True
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.modified = False
+
+
+class SqliteSessionStore:
+    # Session payloads in a SQLite database in WAL mode, so several worker
+    # processes can read concurrently while one writes. Values are stored as
+    # zlib-compressed tagged JSON and expire after ttl seconds.
+
+    def __init__(self, path, ttl=24 * 3600, purge_interval=300):
+        self.path = path
+        self.ttl = ttl
+        self.purge_interval = purge_interval
+        self.serializer = TaggedJSONSerializer()
+        self._local = threading.local()
+        self._last_purge = 0.0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS sessions ("
+                         "sid TEXT PRIMARY KEY, data BLOB NOT NULL, expires REAL NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS sessions_expires ON sessions (expires)")
+
+    def _connect(self):
+        # One connection per thread and per process; a connection must never cross a fork
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def encode(self, data):
+        return zlib.compress(self.serializer.dumps(dict(data)).encode('utf-8'))
+
+    def decode(self, blob):
+        return self.serializer.loads(zlib.decompress(blob).decode('utf-8'))
+
+    def load(self, sid):
+        row = self._connect().execute(
+            "SELECT data, expires FROM sessions WHERE sid = ?", (sid,)).fetchone()
+        if row is None or row[1] < time.time():
+            return None, None
+        return self.decode(row[0]), row[1]
+
+    def save(self, sid, data):
+        expires = time.time() + self.ttl
+        self._connect().execute(
+            "INSERT INTO sessions (sid, data, expires) VALUES (?, ?, ?) "
+            "ON CONFLICT(sid) DO UPDATE SET data = excluded.data, expires = excluded.expires",
+            (sid, self.encode(data), expires))
+        self._maybe_purge()
+        return expires
+
+    def touch(self, sid):
+        self._connect().execute("UPDATE sessions SET expires = ? WHERE sid = ?", (time.time() + self.ttl, sid))
+
+    def delete(self, sid):
+        self._connect().execute("DELETE FROM sessions WHERE sid = ?", (sid,))
+
+    def purge_expired(self):
+        return self._connect().execute("DELETE FROM sessions WHERE expires < ?", (time.time(),)).rowcount
+
+    def _maybe_purge(self):
+        now = time.time()
+        if now - self._last_purge > self.purge_interval:
+            self._last_purge = now
+            self.purge_expired()
+
+    def snapshot(self):
+        count, size = self._connect().execute(
+            "SELECT COUNT(*), COALESCE(SUM(LENGTH(data)), 0) FROM sessions").fetchone()
+        return {'sessions': count, 'bytes': size}
+
+
+class SqliteSessionInterface(SessionInterface):
+    # Keeps the session server-side; the cookie only carries a signed, opaque session id
+
+    def __init__(self, store, salt='server-session'):
+        self.store = store
+        self.salt = salt
+
+    def _signer(self, app):
+        return Signer(app.secret_key, salt=self.salt)
+
+    def open_session(self, app, request):
+        if not app.secret_key:
+            return None
+        cookie = request.cookies.get(self.get_cookie_name(app))
+        if cookie:
+            try:
+                sid = self._signer(app).unsign(cookie).decode('ascii')
+            except BadSignature:
+                sid = None
+            if sid:
+                data, expires = self.store.load(sid)
+                if data is not None:
+                    session = ServerSession(data, sid=sid)
+                    session.expires = expires
+                    return session
+        return ServerSession(sid=secrets.token_urlsafe(32), new=True)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        if not session:
+            if session.modified and not session.new:
+                self.store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+        if session.modified:
+            self.store.save(session.sid, session)
+        elif getattr(session, 'expires', None) and session.expires - time.time() < self.store.ttl / 2:
+            # Sliding expiry without rewriting the payload on every request
+            self.store.touch(session.sid)
+        if session.new or session.modified:
+            response.vary.add('Cookie')
+            response.set_cookie(
+                name,
+                self._signer(app).sign(session.sid.encode('ascii')).decode('ascii'),
+                expires=self.get_expiration_time(app, session),
+                httponly=self.get_cookie_httponly(app),
+                domain=domain,
+                path=path,
+                secure=self.get_cookie_secure(app),
+                samesite=self.get_cookie_samesite(app),
+            )
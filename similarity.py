@@ -0,0 +1,220 @@
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+import sys
+import tempfile
+import zlib
+from itertools import count
+
+# A second relevance signal next to keyword matching: cosine similarity of
+# TF-IDF vectors over hashed word unigrams and bigrams. Hashing needs no
+# vocabulary, so only the IDF table (one float per feature bucket) has to be
+# precomputed from a corpus; `python similarity.py build PDFS...` writes it.
+# Without a table every feature weighs the same and the score is a plain
+# term-frequency cosine.
+IDF_PATH = os.environ.get('SKILLGAP_IDF') or os.path.join('cache', 'similarity_idf.npz')
+N_FEATURES = 2 ** 18
+FORMAT_VERSION = 1
+_PRIME = 0x100000001B3
+_WORD = re.compile(r"[a-z0-9][a-z0-9+#]*")
+STOPWORDS = frozenset("""
+a about above after again all also am an and any are as at be been being below between both but by can could
+did do does doing down during each etc few for from further had has have having he her here hers him his how i
+if in into is it its itself just me more most my no nor not now of off on once only or other our ours out over
+own per same she should so some such than that the their theirs them then there these they this those through
+to too under until up upon us very was we were what when where which while who whom why will with would you
+your yours
+""".split())
+
+logger = logging.getLogger(__name__)
+
+
+class SparseRows:
+    # L2-normalised TF-IDF rows in CSR form: row i is indices/data[indptr[i]:indptr[i + 1]]
+
+    def __init__(self, indptr, indices, data):
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+
+    def __len__(self):
+        return len(self.indptr) - 1
+
+    def row(self, i):
+        start, stop = self.indptr[i], self.indptr[i + 1]
+        return self.indices[start:stop], self.data[start:stop]
+
+
+def hashed_features(text, n_features=N_FEATURES):
+    # (sorted feature buckets, counts) for the words and word pairs of text
+    import numpy as np
+    tokens = [t for t in _WORD.findall(text.lower()) if t not in STOPWORDS]
+    if not tokens:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+    # Hash each distinct word once; ids follow first appearance, like the vocabulary's key order
+    vocabulary = {}
+    ids = np.fromiter(map(vocabulary.setdefault, tokens, count()), dtype=np.int64, count=len(tokens))
+    _unique, positions = np.unique(ids, return_inverse=True)
+    word_hashes = np.fromiter((zlib.crc32(w.encode('utf-8')) for w in vocabulary), dtype=np.uint64,
+                              count=len(vocabulary))[positions]
+    pair_hashes = (word_hashes[:-1] * np.uint64(_PRIME)) ^ (word_hashes[1:] + np.uint64(1))
+    buckets = np.concatenate([word_hashes, pair_hashes]) % np.uint64(n_features)
+    indices, counts = np.unique(buckets.astype(np.int64), return_counts=True)
+    return indices, counts.astype(np.float32)
+
+
+def build_idf(texts, n_features=N_FEATURES):
+    # Smoothed inverse document frequency, log((1 + n) / (1 + df)) + 1, per feature bucket
+    import numpy as np
+    df = np.zeros(n_features, dtype=np.int64)
+    documents = 0
+    for text in texts:
+        indices, _counts = hashed_features(text, n_features)
+        df[indices] += 1
+        documents += 1
+    idf = np.log((1.0 + documents) / (1.0 + df)) + 1.0
+    return idf.astype(np.float32), documents
+
+
+def save_idf(path, idf, documents):
+    import numpy as np
+    version = hashlib.sha256(idf.tobytes()).hexdigest()[:16]
+    meta = {'format': FORMAT_VERSION, 'version': version, 'documents': documents, 'n_features': len(idf)}
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            np.savez(out, idf=idf, meta=np.frombuffer(json.dumps(meta).encode('utf-8'), dtype=np.uint8))
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return version
+
+
+class TfidfModel:
+    # Turns text into L2-normalised hashed TF-IDF rows (sublinear term
+    # frequency) and scores them by cosine similarity. Many rows are scored
+    # against one query in a single sparse x dense product, so one job
+    # description against thousands of resumes costs one pass over their
+    # nonzeros.
+
+    def __init__(self, idf=None, n_features=N_FEATURES, version='uniform', documents=0):
+        import numpy as np
+        self._np = np
+        self.n_features = n_features if idf is None else len(idf)
+        self.idf = np.ones(self.n_features, dtype=np.float32) if idf is None else idf
+        self.version = version
+        self.documents = documents
+
+    @classmethod
+    def load(cls, path):
+        import numpy as np
+        with np.load(path) as archive:
+            meta = json.loads(archive['meta'].tobytes())
+            if meta['format'] != FORMAT_VERSION:
+                raise ValueError(f"{path} was written with format {meta['format']}")
+            return cls(archive['idf'], version=meta['version'], documents=meta['documents'])
+
+    def vector(self, text):
+        # (indices, weights) of one normalised row
+        np = self._np
+        indices, counts = hashed_features(text, self.n_features)
+        weights = (1.0 + np.log(counts)) * self.idf[indices]
+        norm = float(np.sqrt(np.dot(weights, weights)))
+        return indices, weights / norm if norm else weights
+
+    def transform(self, texts):
+        np = self._np
+        rows = [self.vector(text) for text in texts]
+        indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+        indptr[1:] = np.cumsum([len(indices) for indices, _weights in rows])
+        if not rows:
+            return SparseRows(indptr, np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32))
+        return SparseRows(indptr, np.concatenate([r[0] for r in rows]), np.concatenate([r[1] for r in rows]))
+
+    def dense(self, vector):
+        np = self._np
+        query = np.zeros(self.n_features, dtype=np.float32)
+        indices, weights = vector
+        query[indices] = weights
+        return query
+
+    def similarities(self, rows, query):
+        # Cosine of every row against query (a vector() or a dense() array)
+        np = self._np
+        if isinstance(query, tuple):
+            query = self.dense(query)
+        products = rows.data * query[rows.indices]
+        # Prefix sums give every row's dot product at once, including empty rows
+        totals = np.concatenate([[0.0], np.cumsum(products, dtype=np.float64)])
+        return np.clip(totals[rows.indptr[1:]] - totals[rows.indptr[:-1]], 0.0, 1.0)
+
+    def cosine(self, a, b):
+        # Cosine of two vector()s; cheaper than similarities() for a single pair
+        (a_indices, a_weights), (b_indices, b_weights) = a, b
+        _common, a_at, b_at = self._np.intersect1d(a_indices, b_indices, assume_unique=True, return_indices=True)
+        return min(float(self._np.dot(a_weights[a_at], b_weights[b_at])), 1.0)
+
+    def similarity(self, text, other):
+        return self.cosine(self.vector(text), self.vector(other))
+
+
+_model = None
+
+
+def current():
+    # The shared model, loaded on first use; rebuild the table and restart to pick up a new one
+    global _model
+    if _model is None:
+        if os.path.exists(IDF_PATH):
+            _model = TfidfModel.load(IDF_PATH)
+            logger.info("Similarity IDF table %s loaded from %s (%d documents)",
+                        _model.version, IDF_PATH, _model.documents)
+        else:
+            _model = TfidfModel()
+            logger.info("No similarity IDF table at %s; using uniform weights", IDF_PATH)
+    return _model
+
+
+def _iter_corpus(inputs):
+    from pdf_extract import extract_text
+    for item in inputs:
+        paths = [item]
+        if os.path.isdir(item):
+            paths = sorted(os.path.join(root, f) for root, _dirs, files in os.walk(item) for f in files)
+        for path in paths:
+            lower = path.lower()
+            try:
+                if lower.endswith('.pdf'):
+                    yield extract_text(path)[0]
+                elif lower.endswith('.txt'):
+                    with open(path, encoding='utf-8', errors='replace') as f:
+                        yield f.read()
+            except Exception as e:
+                print(f"skipping {path}: {e}", file=sys.stderr)
+
+
+def main(argv=None):
+    # python similarity.py build [--out PATH] PDFS_OR_DIRS...: computes the IDF table from a corpus
+    # of resumes and job descriptions (PDF or .txt files)
+    import argparse
+    parser = argparse.ArgumentParser(description="Build the IDF table for text similarity")
+    parser.add_argument('command', choices=['build'])
+    parser.add_argument('inputs', nargs='+', help="PDF/.txt files or directories of them")
+    parser.add_argument('--out', default=IDF_PATH)
+    parser.add_argument('--features', type=int, default=N_FEATURES)
+    args = parser.parse_args(argv)
+    idf, documents = build_idf(_iter_corpus(args.inputs), args.features)
+    if not documents:
+        sys.exit("no documents found")
+    version = save_idf(args.out, idf, documents)
+    print(f"{version}: IDF over {documents} documents, {math.log2(args.features):g}-bit features -> {args.out}")
+
+
+if __name__ == '__main__':
+    main()
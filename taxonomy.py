@@ -0,0 +1,466 @@
+import hashlib
+import json
+import logging
+import math
+import mmap
+import os
+import re
+import struct
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from itertools import repeat
+
+# The skill taxonomy (categories, aliases and market weights) lives in a JSON
+# file and is compiled into a flat binary that every process memory-maps. The
+# pattern tables used for matching are read straight from the shared pages;
+# skill names, the token vocabulary and the category/weight lookups are still
+# built per process when a taxonomy is loaded (a few MB for 10,000 skills, see
+# benchmarks/bench_skill_matcher.py). Compiled files are named after the
+# taxonomy version and written atomically, so any number of processes can
+# compile, load and swap concurrently.
+TAXONOMY_PATH = os.environ.get('SKILLGAP_TAXONOMY') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'taxonomy.json')
+COMPILED_FOLDER = os.path.join('cache', 'taxonomy')
+COMPILED_KEEP = 3
+# How often current() looks at the source file for changes
+CHECK_INTERVAL = 5.0
+
+MAGIC = b'SKTX'
+FORMAT_VERSION = 1
+_SEED = 0x9E3779B97F4A7C15
+_PRIME = 0x100000001B3
+# Up to this many patterns, present() runs one regular expression per pattern
+# over the raw text instead of tokenizing it and hashing every n-gram; on the
+# bundled taxonomy that is about 3ms instead of 15ms for 140k characters, and
+# the two break even somewhere above 100 patterns.
+SMALL_TAXONOMY_PATTERNS = 64
+
+# Text is matched as a sequence of word and punctuation tokens, so a skill only
+# matches on word boundaries and any run of whitespace (PDF text is full of
+# newlines mid-phrase) separates words the same way a single space does.
+_TOKEN = re.compile(r"\w+|[^\w\s]")
+_WORD = re.compile(r"\w+")
+
+logger = logging.getLogger(__name__)
+
+
+class TaxonomyError(ValueError):
+    pass
+
+
+def tokenize(text):
+    return _TOKEN.findall(text.lower())
+
+
+def _pattern_regex(tokens):
+    # Matches the token sequence in lower-cased text exactly as tokenize() would
+    # split it: a word token is a whole \w+ run, consecutive words need
+    # whitespace between them and a punctuation token may touch its neighbours.
+    parts = []
+    previous_word = False
+    for i, token in enumerate(tokens):
+        word = bool(_WORD.fullmatch(token))
+        if i:
+            parts.append(r'\s+' if word and previous_word else r'\s*')
+        parts.append(rf'(?<!\w){re.escape(token)}(?!\w)' if word else re.escape(token))
+        previous_word = word
+    return re.compile(''.join(parts))
+
+
+def _vocabulary(pattern_texts):
+    # token -> id for every token used by a pattern; 0 is left for tokens no pattern uses
+    tokens = sorted({token for text in pattern_texts for token in text.split(' ')})
+    return {token: i + 1 for i, token in enumerate(tokens)}
+
+
+def _token_ids(np, vocabulary, tokens):
+    return np.fromiter(map(vocabulary.get, tokens, repeat(0)), dtype=np.uint64, count=len(tokens))
+
+
+def _mix(np, h, x):
+    h = (h ^ x) * np.uint64(_PRIME)
+    return h ^ (h >> np.uint64(29))
+
+
+def _ngram_hashes(np, token_ids, max_tokens):
+    # Yields (n, hashes) where hashes[i] identifies tokens[i:i + n]
+    h = _mix(np, np.uint64(_SEED), token_ids)
+    for n in range(1, max_tokens + 1):
+        if n > 1:
+            h = _mix(np, h[:-1], token_ids[n - 1:])
+        if not len(h):
+            return
+        yield n, h
+
+
+def _skill_name(value, what):
+    if not isinstance(value, str) or not value.strip():
+        raise TaxonomyError(f"{what} must be a non-empty string, not {value!r}")
+    return value.lower()
+
+
+def _weight(skill, value):
+    number = None
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        try:
+            number = float(value)
+        except OverflowError:
+            pass
+    if number is None or not math.isfinite(number) or number < 0:
+        raise TaxonomyError(f"Weight for {skill!r} must be a non-negative number, not {value!r}")
+    return number
+
+
+def parse_source(data):
+    # Validates a taxonomy document and returns it in canonical form:
+    # {'categories': {name: [skills]}, 'aliases': {alias: skill}, 'weights': {skill: weight}}.
+    # Anything malformed raises TaxonomyError, so a bad edit never surfaces as another exception.
+    try:
+        doc = json.loads(data)
+    except (ValueError, RecursionError) as e:
+        raise TaxonomyError(f"Taxonomy is not valid JSON: {e}")
+    if not isinstance(doc, dict):
+        raise TaxonomyError("Taxonomy must be a JSON object")
+    categories = doc.get('categories')
+    if not isinstance(categories, dict) or not categories:
+        raise TaxonomyError("Taxonomy needs a non-empty 'categories' object")
+    if len(categories) > 32:
+        raise TaxonomyError("At most 32 categories are supported")
+    canonical = {'categories': {}, 'aliases': {}, 'weights': {}}
+    known = set()
+    for category, skills in categories.items():
+        if not isinstance(skills, list):
+            raise TaxonomyError(f"Category {category!r} must be a list of skills")
+        canonical['categories'][category] = [_skill_name(s, f"Skill in {category!r}") for s in skills]
+        known.update(canonical['categories'][category])
+    aliases = doc.get('aliases') or {}
+    weights = doc.get('weights') or {}
+    for name, value in (('aliases', aliases), ('weights', weights)):
+        if not isinstance(value, dict):
+            raise TaxonomyError(f"'{name}' must be an object")
+    for alias, skill in aliases.items():
+        skill = _skill_name(skill, f"Alias {alias!r}")
+        if skill not in known:
+            raise TaxonomyError(f"Alias {alias!r} points at unknown skill {skill!r}")
+        canonical['aliases'][_skill_name(alias, 'Alias')] = skill
+    for skill, weight in weights.items():
+        if skill.lower() not in known:
+            raise TaxonomyError(f"Weight given for unknown skill {skill!r}")
+        canonical['weights'][skill.lower()] = _weight(skill, weight)
+    return canonical
+
+
+def source_version(canonical):
+    payload = json.dumps(canonical, sort_keys=True).encode('utf-8')
+    return hashlib.sha256(payload).hexdigest()[:16]
+
+
+def compile_taxonomy(canonical, out_path):
+    import numpy as np
+    categories = list(canonical['categories'])
+    skills = []
+    skill_ids = {}
+    skill_categories = []
+    for c, category in enumerate(categories):
+        for skill in canonical['categories'][category]:
+            if skill not in skill_ids:
+                skill_ids[skill] = len(skills)
+                skills.append(skill)
+                skill_categories.append(0)
+            skill_categories[skill_ids[skill]] |= 1 << c
+
+    strings = []
+    patterns = []
+    seen = {}
+    for text, skill in [(s, s) for s in skills] + list(canonical['aliases'].items()):
+        tokens = tokenize(text)
+        key = ' '.join(tokens)
+        if len(tokens) > 255:
+            raise TaxonomyError(f"{text[:40]!r}... is longer than 255 tokens")
+        if not tokens or key in seen:
+            if tokens and seen[key] != skill_ids[skill]:
+                raise TaxonomyError(f"{text!r} is both a skill and an alias of another skill")
+            continue
+        seen[key] = skill_ids[skill]
+        patterns.append((tokens, skill_ids[skill], len(strings)))
+        strings.append(key)
+    name_base = len(strings)
+    strings.extend(skills)
+
+    vocabulary = _vocabulary(strings[:name_base])
+    hashes = np.zeros(len(patterns), dtype=np.uint64)
+    for i, (tokens, _skill, _text) in enumerate(patterns):
+        for n, h in _ngram_hashes(np, _token_ids(np, vocabulary, tokens), len(tokens)):
+            if n == len(tokens):
+                hashes[i] = h[0]
+    order = np.argsort(hashes, kind='stable')
+    if len(order) > 1 and (np.diff(hashes[order]) == 0).any():
+        raise TaxonomyError("Hash collision between two skill patterns; rename one of them")
+
+    blob = b''.join(s.encode('utf-8') for s in strings)
+    offsets = np.zeros(len(strings) + 1, dtype=np.uint64)
+    offsets[1:] = np.cumsum([len(s.encode('utf-8')) for s in strings])
+    weights = np.array([canonical['weights'].get(s, np.nan) for s in skills], dtype=np.float64)
+    sections = [
+        ('pattern_hash', hashes[order]),
+        ('pattern_skill', np.array([p[1] for p in patterns], dtype=np.uint32)[order]),
+        ('pattern_text', np.array([p[2] for p in patterns], dtype=np.uint32)[order]),
+        ('pattern_length', np.array([len(p[0]) for p in patterns], dtype=np.uint8)[order]),
+        ('skill_categories', np.array(skill_categories, dtype=np.uint32)),
+        ('skill_weight', weights),
+        ('string_offset', offsets),
+        ('strings', np.frombuffer(blob, dtype=np.uint8)),
+    ]
+    header = {'format': FORMAT_VERSION, 'version': source_version(canonical), 'categories': categories,
+              'skills': len(skills), 'name_base': name_base,
+              'max_tokens': max((len(p[0]) for p in patterns), default=0), 'sections': {}}
+    # Section offsets depend on the header length, so lay out with a generous fixed header size
+    header_size = 4096 + 64 * len(categories)
+    position = header_size
+    for name, array in sections:
+        header['sections'][name] = [position, array.dtype.str, len(array)]
+        position += (array.nbytes + 7) // 8 * 8
+    header_bytes = json.dumps(header).encode('utf-8')
+    if len(header_bytes) + 8 > header_size:
+        raise TaxonomyError("Taxonomy header too large")
+
+    directory = os.path.dirname(out_path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            out.write(MAGIC + struct.pack('<I', len(header_bytes)) + header_bytes)
+            for name, array in sections:
+                out.seek(header['sections'][name][0])
+                out.write(array.tobytes())
+            out.truncate(position)
+        os.replace(tmp_path, out_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return header['version']
+
+
+class CompiledTaxonomy:
+    # A compiled taxonomy mapped read-only into memory. Matching tokenizes the
+    # text, maps tokens to vocabulary ids, hashes every 1..max_tokens token
+    # n-gram, looks the hashes up in the sorted pattern table and confirms each
+    # hit against the pattern text, so results equal an exact phrase match.
+    # present() on a small taxonomy uses per-pattern regular expressions with
+    # the same token semantics instead. Aliases report the skill they stand for.
+
+    def __init__(self, path):
+        import numpy as np
+        self._np = np
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[:4] != MAGIC:
+            raise TaxonomyError(f"{path} is not a compiled taxonomy")
+        header_len = struct.unpack_from('<I', self._mmap, 4)[0]
+        header = json.loads(self._mmap[8:8 + header_len])
+        if header['format'] != FORMAT_VERSION:
+            raise TaxonomyError(f"{path} was compiled with format {header['format']}")
+        self.version = header['version']
+        self.max_tokens = header['max_tokens']
+        self._arrays = {name: np.frombuffer(self._mmap, dtype=np.dtype(dtype), count=count, offset=offset)
+                        for name, (offset, dtype, count) in header['sections'].items()}
+        self._offsets = self._arrays['string_offset']
+        self._strings_at = header['sections']['strings'][0]
+        self.category_names = header['categories']
+        name_base = header['name_base']
+        self.skills = [self._string(name_base + i) for i in range(header['skills'])]
+        self._vocabulary = _vocabulary(self._string(i) for i in range(name_base))
+        self.index = {skill: i for i, skill in enumerate(self.skills)}
+        self._regexes = None
+        # Plain Python objects, private to this process
+        masks = self._arrays['skill_categories'].tolist()
+        self.categories = {skill: [c for b, c in enumerate(self.category_names) if masks[i] >> b & 1]
+                           for i, skill in enumerate(self.skills)}
+        self.weights = {skill: w for skill, w in zip(self.skills, self._arrays['skill_weight'].tolist()) if w == w}
+
+    def _string(self, i):
+        base = self._strings_at
+        return self._mmap[base + int(self._offsets[i]):base + int(self._offsets[i + 1])].decode('utf-8')
+
+    def _hits(self, tokens):
+        # Yields (n, token indexes, pattern rows) of the hash hits for each n-gram length
+        np = self._np
+        if not tokens:
+            return
+        table = self._arrays['pattern_hash']
+        for n, hashes in _ngram_hashes(np, _token_ids(np, self._vocabulary, tokens), self.max_tokens):
+            idx = np.minimum(np.searchsorted(table, hashes), len(table) - 1)
+            at = np.flatnonzero(table[idx] == hashes)
+            rows = idx[at]
+            keep = self._arrays['pattern_length'][rows] == n
+            yield n, at[keep], rows[keep]
+
+    def _verify(self, tokens, i, n, row):
+        return ' '.join(tokens[i:i + n]) == self._string(int(self._arrays['pattern_text'][row]))
+
+    def _scan(self, tokens):
+        # Yields (first token index, token count, skill index) for every match
+        pattern_skill = self._arrays['pattern_skill']
+        for n, at, rows in self._hits(tokens):
+            for i, row in zip(at.tolist(), rows.tolist()):
+                if self._verify(tokens, i, n, row):
+                    yield i, n, int(pattern_skill[row])
+
+    def find_all(self, text):
+        # Returns (start, end, skill) character offsets for every occurrence, in text order
+        found = list(_TOKEN.finditer(text.lower()))
+        tokens = [m.group() for m in found]
+        matches = [(found[i].start(), found[i + n - 1].end(), self.skills[s]) for i, n, s in self._scan(tokens)]
+        matches.sort()
+        return matches
+
+    def positions(self, text):
+        found = {}
+        for start, _end, skill in self.find_all(text):
+            found.setdefault(skill, []).append(start)
+        return found
+
+    def counts(self, text):
+        return Counter(self.skills[s] for _i, _n, s in self._scan(tokenize(text)))
+
+    def _pattern_regexes(self):
+        if self._regexes is None:
+            pattern_skill = self._arrays['pattern_skill'].tolist()
+            pattern_text = self._arrays['pattern_text'].tolist()
+            self._regexes = [(_pattern_regex(self._string(t).split(' ')), self.skills[s])
+                             for s, t in zip(pattern_skill, pattern_text)]
+        return self._regexes
+
+    def present(self, text):
+        if len(self._arrays['pattern_hash']) <= SMALL_TAXONOMY_PATTERNS:
+            lowered = text.lower()
+            return {skill for regex, skill in self._pattern_regexes() if regex.search(lowered)}
+        # One confirmed occurrence per pattern is enough, so only the first hit of each is checked
+        # unless it turns out to be a hash collision
+        np = self._np
+        tokens = tokenize(text)
+        found = set()
+        for n, at, rows in self._hits(tokens):
+            unique_rows, first = np.unique(rows, return_index=True)
+            for row, i in zip(unique_rows.tolist(), at[first].tolist()):
+                if self._verify(tokens, i, n, row) or any(self._verify(tokens, j, n, row) for j in at[rows == row].tolist()):
+                    found.add(self.skills[int(self._arrays['pattern_skill'][row])])
+        return found
+
+    def group(self, present):
+        # category -> skills in taxonomy order, for a set of skills already found
+        found_skills = {category: [] for category in self.category_names}
+        for skill in self.skills:
+            if skill in present:
+                for category in self.categories[skill]:
+                    found_skills[category].append(skill)
+        return found_skills
+
+    def extract(self, text):
+        return self.group(self.present(text))
+
+    def snapshot(self):
+        return {'version': self.version, 'skills': len(self.skills), 'patterns': len(self._arrays['pattern_hash']),
+                'bytes': len(self._mmap)}
+
+
+_current = None
+_source_state = None
+_last_check = 0.0
+_lock = threading.Lock()
+
+
+def _prune_compiled(keep_path):
+    try:
+        names = [os.path.join(COMPILED_FOLDER, n) for n in os.listdir(COMPILED_FOLDER) if n.endswith('.sktx')]
+    except FileNotFoundError:
+        return
+    try:
+        names.sort(key=os.path.getmtime, reverse=True)
+        for path in names[COMPILED_KEEP:]:
+            if path != keep_path:
+                # Processes that still map an old file keep it alive until they swap
+                os.remove(path)
+    except FileNotFoundError:
+        pass  # another process pruned concurrently
+
+
+def load(source_path=None):
+    # Compiles (unless an up-to-date compiled file exists) and loads a taxonomy without activating it
+    source_path = source_path or TAXONOMY_PATH
+    with open(source_path, 'rb') as f:
+        canonical = parse_source(f.read())
+    version = source_version(canonical)
+    compiled = os.path.join(COMPILED_FOLDER, f"{version}.sktx")
+    try:
+        return CompiledTaxonomy(compiled)
+    except (FileNotFoundError, TaxonomyError):
+        compile_taxonomy(canonical, compiled)
+        _prune_compiled(compiled)
+        return CompiledTaxonomy(compiled)
+
+
+def _stat(path):
+    st = os.stat(path)
+    return (path, st.st_mtime_ns, st.st_size)
+
+
+def reload(source_path=None):
+    # Loads the source file and swaps it in; in-flight analyses keep the taxonomy they started with
+    global _current, _source_state, _last_check, TAXONOMY_PATH
+    with _lock:
+        source_path = source_path or TAXONOMY_PATH
+        state = _stat(source_path)
+        taxonomy = load(source_path)
+        previous = _current
+        _current, _source_state, _last_check = taxonomy, state, time.monotonic()
+        TAXONOMY_PATH = source_path
+    if previous is None or previous.version != taxonomy.version:
+        logger.info("Skill taxonomy %s loaded from %s (%d skills)", taxonomy.version, source_path, len(taxonomy.skills))
+    return taxonomy
+
+
+def current():
+    # The active taxonomy, reloaded when its source file has changed (checked every CHECK_INTERVAL seconds)
+    global _last_check, _source_state
+    taxonomy = _current
+    if taxonomy is None:
+        return reload()
+    now = time.monotonic()
+    if now - _last_check < CHECK_INTERVAL:
+        return taxonomy
+    _last_check = now
+    try:
+        changed = _stat(TAXONOMY_PATH) != _source_state
+    except OSError:
+        return taxonomy
+    if changed:
+        try:
+            return reload()
+        except (OSError, TaxonomyError) as e:
+            # Keep serving the last good taxonomy; do not retry until the file changes again
+            try:
+                _source_state = _stat(TAXONOMY_PATH)
+            except OSError:
+                pass
+            logger.error("Keeping skill taxonomy %s, reload failed: %s", taxonomy.version, e)
+    return _current
+
+
+def main(argv=None):
+    # python taxonomy.py SOURCE.json [OUT.sktx]: validate and compile, printing the version
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        sys.exit("usage: python taxonomy.py SOURCE.json [OUT.sktx]")
+    with open(argv[0], 'rb') as f:
+        canonical = parse_source(f.read())
+    out = argv[1] if len(argv) > 1 else os.path.join(COMPILED_FOLDER, f"{source_version(canonical)}.sktx")
+    version = compile_taxonomy(canonical, out)
+    print(f"{version} -> {out}")
+
+
+if __name__ == '__main__':
+    main()
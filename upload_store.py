@@ -0,0 +1,322 @@
+import hashlib
+import logging
+import os
+import re
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+
+CHUNK_SIZE = 64 * 1024
+# Readers accept up to 1KB of junk before the %PDF- header, and expect startxref
+# and %%EOF at the very end (a little trailing junk is tolerated there too)
+PDF_HEAD_WINDOW = 1024
+PDF_TAIL_WINDOW = 2048
+# Spool files left behind by interrupted uploads are removed after this long
+TMP_MAX_AGE = 3600
+_NAME = re.compile(r'^([0-9a-f]{64})\.pdf$')
+_PDF_HEADER = re.compile(rb'%PDF-\d\.\d')
+_STARTXREF = re.compile(rb'startxref\s+(\d+)\s+%%EOF')
+_XREF_SECTION = re.compile(rb'\s*(xref|\d+\s+\d+\s+obj)')
+
+logger = logging.getLogger(__name__)
+
+
+class UploadRejected(Exception):
+    # Not a ValueError: Werkzeug's form parser silently drops those when they
+    # are raised while a file part is being streamed
+    status = 400
+
+
+class UploadTooLarge(UploadRejected):
+    status = 413
+
+
+def _too_large(max_bytes):
+    return UploadTooLarge(f"File is larger than the {max_bytes / 1024 ** 2:.3g} MB upload limit")
+
+
+def _head_problem(head):
+    return None if _PDF_HEADER.search(head) else "File is not a PDF"
+
+
+def _tail_problem(tail, size, f):
+    # The last startxref must point inside the file at an xref table or xref stream object
+    matches = list(_STARTXREF.finditer(tail))
+    if not matches:
+        return "PDF is truncated or damaged (no startxref/%%EOF trailer)"
+    offset = int(matches[-1].group(1))
+    if offset >= size:
+        return "PDF is damaged (startxref points past the end of the file)"
+    f.seek(offset)
+    if not _XREF_SECTION.match(f.read(32)):
+        return "PDF is damaged (startxref does not point at a cross-reference section)"
+    return None
+
+
+def check_pdf_file(path, max_bytes=None):
+    # The checks IncomingUpload makes as bytes arrive, for a PDF that reached disk some other way
+    # (unpacked from a ZIP, say). Raises UploadRejected.
+    size = os.path.getsize(path)
+    if max_bytes is not None and size > max_bytes:
+        raise _too_large(max_bytes)
+    with open(path, 'rb') as f:
+        head = f.read(PDF_HEAD_WINDOW)
+        f.seek(max(0, size - PDF_TAIL_WINDOW))
+        problem = _head_problem(head) or _tail_problem(f.read(), size, f)
+    if problem:
+        raise UploadRejected(problem)
+
+
+class IncomingUpload:
+    # A spool file inside the store that an upload is written into chunk by
+    # chunk (by save_stream, or directly by Werkzeug's form parser). Bytes are
+    # hashed, counted and sniffed as they arrive, so an oversized or non-PDF
+    # upload is refused part way through and a good one is committed by a
+    # rename, without reading it back.
+
+    def __init__(self, store, max_bytes=None):
+        self.store = store
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.digest = None
+        self._hash = hashlib.sha256()
+        self._head = b''
+        self._tail = b''
+        fd, self.tmp_path = tempfile.mkstemp(dir=os.path.join(store.root, 'tmp'))
+        self._file = os.fdopen(fd, 'w+b')
+
+    def write(self, data):
+        self.size += len(data)
+        if self.max_bytes is not None and self.size > self.max_bytes:
+            self._refuse(_too_large(self.max_bytes))
+        if len(self._head) < PDF_HEAD_WINDOW:
+            self._head += data[:PDF_HEAD_WINDOW - len(self._head)]
+            if len(self._head) == PDF_HEAD_WINDOW:
+                self._check_head()
+        self._tail = (self._tail + data[-PDF_TAIL_WINDOW:])[-PDF_TAIL_WINDOW:]
+        self._hash.update(data)
+        return self._file.write(data)
+
+    def _refuse(self, error):
+        self.close()
+        with self.store._lock:
+            self.store.stats['rejected'] += 1
+        raise error
+
+    def _reject(self, message):
+        self._refuse(UploadRejected(message))
+
+    def _check_head(self):
+        problem = _head_problem(self._head)
+        if problem:
+            self._reject(problem)
+
+    def _check_tail(self):
+        problem = _tail_problem(self._tail, self.size, self._file)
+        if problem:
+            self._reject(problem)
+
+    def _finish(self):
+        self._check_head()
+        self._check_tail()
+        self._file.close()
+
+    def commit(self):
+        # Validates the finished upload and moves it into place under its digest. Returns (digest, size).
+        if self.digest is None:
+            self._finish()
+            self.digest = self._hash.hexdigest()
+            self.store._commit(self.digest, self.tmp_path, self.size)
+            self.close()
+        return self.digest, self.size
+
+    def move_to(self, path):
+        # Validates the finished upload and moves it out to path instead of into the store,
+        # for uploads only needed for the request (a rename when path is on the same filesystem)
+        self._finish()
+        shutil.move(self.tmp_path, path)
+
+    def close(self):
+        self._file.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+    def __getattr__(self, name):
+        # read/seek/tell etc. for Werkzeug's FileStorage, which rewinds the stream after parsing
+        return getattr(self._file, name)
+
+
+class UploadStore:
+    # Content-addressed upload storage. Each upload is hashed while it is being
+    # written, so identical PDFs are stored once at root/ab/cd/<sha256>.pdf.
+    # Owners (sessions, bulk jobs) hold expiring references to blobs; a
+    # background sweep deletes blobs that are unreferenced and idle for longer
+    # than ttl, and then the least recently used unreferenced blobs while the
+    # store is over quota_bytes.
+
+    def __init__(self, root, ttl=24 * 3600, quota_bytes=5 * 1024 ** 3, evict_interval=600):
+        self.root = os.path.abspath(root)
+        self.ttl = ttl
+        self.quota_bytes = quota_bytes
+        self.evict_interval = evict_interval
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._evictor = None
+        self.stats = {'stored': 0, 'deduplicated': 0, 'rejected': 0, 'evicted': 0, 'evicted_bytes': 0, 'sweeps': 0}
+        os.makedirs(os.path.join(root, 'tmp'), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS blobs ("
+                         "digest TEXT PRIMARY KEY, size INTEGER NOT NULL, "
+                         "created REAL NOT NULL, last_used REAL NOT NULL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS refs ("
+                         "owner TEXT NOT NULL, digest TEXT NOT NULL, expires REAL NOT NULL, "
+                         "PRIMARY KEY (owner, digest))")
+            conn.execute("CREATE INDEX IF NOT EXISTS refs_digest ON refs (digest)")
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(os.path.join(self.root, 'index.sqlite3'), timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def path_for(self, digest):
+        return os.path.join(self.root, digest[:2], digest[2:4], digest + '.pdf')
+
+    def path_for_name(self, name):
+        # Maps a public '<sha256>.pdf' name to its sharded path; anything else is rejected
+        match = _NAME.match(name or '')
+        if not match:
+            return None
+        return self.path_for(match.group(1))
+
+    @staticmethod
+    def name_for(digest):
+        return digest + '.pdf'
+
+    def incoming(self, max_bytes=None):
+        # A spool to write one upload into; raises UploadRejected as soon as the bytes are refused
+        self._ensure_evictor()
+        return IncomingUpload(self, max_bytes)
+
+    def save_stream(self, stream, max_bytes=None):
+        # Copies the stream into the store while hashing and checking it. Returns (digest, size).
+        incoming = self.incoming(max_bytes)
+        try:
+            for chunk in iter(lambda: stream.read(CHUNK_SIZE), b''):
+                incoming.write(chunk)
+            return incoming.commit()
+        finally:
+            incoming.close()
+
+    def save(self, file_storage, max_bytes=None):
+        stream = file_storage.stream
+        if isinstance(stream, IncomingUpload) and stream.store is self:
+            # Streamed into the store while the request was parsed; only the checks and rename are left
+            return stream.commit()
+        return self.save_stream(stream, max_bytes)
+
+    def _commit(self, digest, tmp_path, size):
+        path = self.path_for(digest)
+        now = time.time()
+        if os.path.exists(path):
+            with self._lock:
+                self.stats['deduplicated'] += 1
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(tmp_path, path)
+            with self._lock:
+                self.stats['stored'] += 1
+        self._connect().execute(
+            "INSERT INTO blobs (digest, size, created, last_used) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(digest) DO UPDATE SET last_used = excluded.last_used",
+            (digest, size, now, now))
+
+    def set_refs(self, owner, digests, ttl=None):
+        # Replaces everything owner references with digests, e.g. when a session uploads new files
+        expires = time.time() + (self.ttl if ttl is None else ttl)
+        conn = self._connect()
+        with conn:
+            conn.execute("BEGIN")
+            conn.execute("DELETE FROM refs WHERE owner = ?", (owner,))
+            conn.executemany("INSERT OR REPLACE INTO refs (owner, digest, expires) VALUES (?, ?, ?)",
+                             [(owner, digest, expires) for digest in set(digests)])
+
+    def add_ref(self, owner, digest, ttl=None):
+        expires = time.time() + (self.ttl if ttl is None else ttl)
+        self._connect().execute("INSERT OR REPLACE INTO refs (owner, digest, expires) VALUES (?, ?, ?)",
+                                (owner, digest, expires))
+
+    def release(self, owner):
+        self._connect().execute("DELETE FROM refs WHERE owner = ?", (owner,))
+
+    def touch(self, digest):
+        self._connect().execute("UPDATE blobs SET last_used = ? WHERE digest = ?", (time.time(), digest))
+
+    def _delete_blob(self, conn, digest, size):
+        try:
+            os.remove(self.path_for(digest))
+        except FileNotFoundError:
+            pass
+        conn.execute("DELETE FROM blobs WHERE digest = ?", (digest,))
+        with self._lock:
+            self.stats['evicted'] += 1
+            self.stats['evicted_bytes'] += size
+
+    def evict(self):
+        # One sweep: expire refs, drop idle unreferenced blobs, then enforce the quota
+        now = time.time()
+        conn = self._connect()
+        conn.execute("DELETE FROM refs WHERE expires < ?", (now,))
+        unreferenced = ("SELECT digest, size FROM blobs WHERE NOT EXISTS "
+                        "(SELECT 1 FROM refs WHERE refs.digest = blobs.digest)")
+        for digest, size in conn.execute(unreferenced + " AND last_used < ?", (now - self.ttl,)).fetchall():
+            self._delete_blob(conn, digest, size)
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+        if total > self.quota_bytes:
+            for digest, size in conn.execute(unreferenced + " ORDER BY last_used").fetchall():
+                if total <= self.quota_bytes:
+                    break
+                self._delete_blob(conn, digest, size)
+                total -= size
+        tmp_dir = os.path.join(self.root, 'tmp')
+        for name in os.listdir(tmp_dir):
+            path = os.path.join(tmp_dir, name)
+            try:
+                if os.path.getmtime(path) < now - TMP_MAX_AGE:
+                    os.remove(path)
+            except FileNotFoundError:
+                pass
+        with self._lock:
+            self.stats['sweeps'] += 1
+        logger.info("Upload sweep: %d bytes stored (quota %d), %d evicted in total",
+                    total, self.quota_bytes, self.stats['evicted'])
+
+    def _ensure_evictor(self):
+        if self._evictor is not None and self._evictor.is_alive():
+            return
+        with self._lock:
+            if self._evictor is not None and self._evictor.is_alive():
+                return
+            self._evictor = threading.Thread(target=self._evict_loop, name='upload-evictor', daemon=True)
+            self._evictor.start()
+
+    def _evict_loop(self):
+        while True:
+            time.sleep(self.evict_interval)
+            try:
+                self.evict()
+            except sqlite3.Error:
+                pass  # another process holds the lock; try again next interval
+
+    def snapshot(self):
+        blobs, size = self._connect().execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM blobs").fetchone()
+        refs = self._connect().execute("SELECT COUNT(*) FROM refs").fetchone()[0]
+        with self._lock:
+            return dict(self.stats, blobs=blobs, bytes=size, refs=refs, quota_bytes=self.quota_bytes)